@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.utils.functional import cached_property
 from joblib import load
+import hashlib
+import threading
 import os
 
+def lazy_artifact(attribute):
+    return property(lambda self: self.load_artifact(attribute))
+
 class AiModelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_models'
@@ -17,27 +24,53 @@ class AiModelsConfig(AppConfig):
     hate_model_path = os.path.join(base_dir, 'ai_models/resources', 'hate_classifier.joblib')
     hate_vectorizer_path = os.path.join(base_dir, 'ai_models/resources', 'hate_vectorizer.joblib')
 
-    toxic_model = None
-    toxic_vectorizer = None
+    artifacts = [
+        'toxic_model', 'toxic_vectorizer',
+        'offensive_model', 'offensive_vectorizer',
+        'hate_model', 'hate_vectorizer',
+    ]
+
+    # Los modelos se cargan la primera vez que se usan, no en ready()
+    toxic_model = lazy_artifact('toxic_model')
+    toxic_vectorizer = lazy_artifact('toxic_vectorizer')
+
+    offensive_model = lazy_artifact('offensive_model')
+    offensive_vectorizer = lazy_artifact('offensive_vectorizer')
+
+    hate_model = lazy_artifact('hate_model')
+    hate_vectorizer = lazy_artifact('hate_vectorizer')
 
-    offensive_model = None
-    offensive_vectorizer = None
+    def __init__(self, app_name, app_module):
+        super().__init__(app_name, app_module)
+        self.loaded_artifacts = {}
+        self.load_lock = threading.Lock()
 
-    hate_model = None
-    hate_vectorizer = None
+    def load_artifact(self, attribute):
+        artifact = self.loaded_artifacts.get(attribute)
+        if artifact is not None:
+            return artifact
 
-    def ready(self):        
-        if not self.toxic_model:
-            self.toxic_model = load(self.toxic_model_path)
-        if not self.toxic_vectorizer:
-            self.toxic_vectorizer = load(self.toxic_vectorizer_path)
+        with self.load_lock:
+            if attribute not in self.loaded_artifacts:
+                path = getattr(self, f'{attribute}_path')
+                # mmap_mode comparte los arrays de numpy como páginas de solo lectura entre procesos
+                mmap_mode = getattr(settings, 'AI_MODELS_MMAP_MODE', 'r') or None
+                self.loaded_artifacts[attribute] = load(path, mmap_mode=mmap_mode)
+        return self.loaded_artifacts[attribute]
 
-        if not self.offensive_model:
-            self.offensive_model = load(self.offensive_model_path)
-        if not self.offensive_vectorizer:
-            self.offensive_vectorizer = load(self.offensive_vectorizer_path)
+    def warm_up(self):
+        for attribute in self.artifacts:
+            self.load_artifact(attribute)
 
-        if not self.hate_model:
-            self.hate_model = load(self.hate_model_path)
-        if not self.hate_vectorizer:
-            self.hate_vectorizer = load(self.hate_vectorizer_path)
+    @cached_property
+    def model_version(self):
+        # Cambia en cuanto se sustituye cualquiera de los artefactos joblib
+        digest = hashlib.sha1()
+        for attribute in self.artifacts:
+            path = getattr(self, f'{attribute}_path')
+            if os.path.exists(path):
+                stat = os.stat(path)
+                digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+            else:
+                digest.update(f'{os.path.basename(path)}:missing;'.encode())
+        return digest.hexdigest()
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from django.apps import apps
+from django.conf import settings
+import hashlib
+import threading
+
+DB_BATCH_SIZE = 500
+
+def normalize_text(text):
+    # Los vectorizadores pasan a minúsculas y tokenizan por palabras, así que ni
+    # las mayúsculas ni los espacios repetidos cambian la puntuación
+    return ' '.join(text.split()).lower()
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+        return found
+
+    def set_many(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+# Caché de dos niveles (LRU en proceso + tabla CachedHateScore) indexada por
+# el hash del texto normalizado y la versión de los modelos
+class ScoreCache:
+    def __init__(self, max_size):
+        self.memory = LRUCache(max_size)
+
+    def model_version(self):
+        return apps.get_app_config('ai_models').model_version
+
+    def get_many(self, hashes):
+        CachedHateScore = apps.get_model('ai_models', 'CachedHateScore')
+        version = self.model_version()
+
+        found = {text_hash: score for (text_hash, _), score in self.memory.get_many([(h, version) for h in hashes]).items()}
+        missing = [h for h in dict.fromkeys(hashes) if h not in found]
+
+        from_db = {}
+        for start in range(0, len(missing), DB_BATCH_SIZE):
+            rows = CachedHateScore.objects.filter(
+                modelVersion=version, textHash__in=missing[start:start + DB_BATCH_SIZE]
+            ).values_list('textHash', 'hateScore')
+            from_db.update(rows)
+
+        if from_db:
+            self.memory.set_many({(h, version): score for h, score in from_db.items()})
+        found.update(from_db)
+        return found
+
+    def set_many(self, scores):
+        CachedHateScore = apps.get_model('ai_models', 'CachedHateScore')
+        version = self.model_version()
+
+        self.memory.set_many({(h, version): score for h, score in scores.items()})
+        CachedHateScore.objects.bulk_create(
+            [CachedHateScore(textHash=h, modelVersion=version, hateScore=score) for h, score in scores.items()],
+            batch_size=DB_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def clear(self):
+        self.memory.clear()
+
+score_cache = ScoreCache(getattr(settings, 'MODERATION_CACHE_SIZE', 10000))
@@ -0,0 +1,107 @@
+from collections import Counter
+from django.conf import settings
+from sklearn.feature_extraction.text import CountVectorizer
+from .cache import score_cache, text_hash
+from .compact import get_compact_models
+from .features import analysis_signature, vectorize_counts
+from .moderation import get_moderation_models, moderation_state
+from .prefilter import is_obviously_clean
+import numpy as np
+
+def class_bounds(classes):
+    classes = np.asarray(classes, dtype=float)
+    return classes.min(), classes.max()
+
+def cascade_stages():
+    # Cada etapa: (firma de análisis, extracción de características, predict, (mínimo, máximo) de su salida)
+    compact_models = get_compact_models()
+    if compact_models:
+        return [
+            (compact_model.analysis_signature, lambda text, compact_model=compact_model: Counter(compact_model.analyze(text)),
+             compact_model.predict_counts, class_bounds(compact_model.classes))
+            for compact_model in compact_models
+        ]
+
+    stages = []
+    for model, vectorizer in get_moderation_models():
+        if isinstance(vectorizer, CountVectorizer):
+            analyzer = vectorizer.build_analyzer()
+            stages.append((
+                analysis_signature(vectorizer), lambda text, analyzer=analyzer: Counter(analyzer(text)),
+                lambda counts, model=model, vectorizer=vectorizer: model.predict(vectorize_counts(vectorizer, counts)),
+                class_bounds(model.classes_)
+            ))
+        else:
+            stages.append((
+                None, lambda text: text,
+                lambda texts, model=model, vectorizer=vectorizer: model.predict(vectorizer.transform(texts)),
+                class_bounds(model.classes_)
+            ))
+    return stages
+
+def run_cascade(items, thresholds, weights, use_cache=True, prefilter=None):
+    if not items:
+        return [], 0
+    if prefilter is None:
+        prefilter = settings.MODERATION_PREFILTER
+
+    stages = cascade_stages()
+    lowest = sum(low for *_, (low, high) in stages)
+    highest = sum(high for *_, (low, high) in stages)
+
+    # Intervalo [low, high] en el que puede acabar la puntuación ponderada de cada elemento
+    low = np.zeros(len(items))
+    high = np.zeros(len(items))
+    pending = []
+
+    hashes = [[text_hash(text) for text in item] for item in items] if use_cache else None
+    cached = score_cache.get_many([h for item_hashes in hashes for h in item_hashes]) if use_cache else {}
+
+    for i, item in enumerate(items):
+        for position, (weight, text) in enumerate(zip(weights, item)):
+            if use_cache and hashes[i][position] in cached:
+                low[i] += weight * cached[hashes[i][position]]
+                high[i] += weight * cached[hashes[i][position]]
+            elif prefilter and is_obviously_clean(text):
+                continue
+            else:
+                low[i] += weight * lowest
+                high[i] += weight * highest
+                pending.append((i, position))
+
+    evaluations = 0
+    features = {}
+    # Primero los textos con más peso, que son los que más acotan la decisión
+    positions = sorted({position for i, position in pending}, key=lambda position: -weights[position])
+
+    for position in positions:
+        for stage, (signature, featurize, predict, (stage_low, stage_high)) in enumerate(stages):
+            undecided = [
+                i for i, p in pending
+                if p == position and moderation_state(low[i], thresholds) != moderation_state(high[i], thresholds)
+            ]
+            if not undecided:
+                break
+
+            key = (signature, position) if signature is not None else (stage, position)
+            computed = features.setdefault(key, {})
+            for i in undecided:
+                if i not in computed:
+                    computed[i] = featurize(items[i][position])
+
+            predictions = predict([computed[i] for i in undecided])
+            evaluations += len(undecided)
+            weight = weights[position]
+            for i, prediction in zip(undecided, predictions):
+                low[i] += weight * (prediction - stage_low)
+                high[i] -= weight * (stage_high - prediction)
+
+    # Si la decisión se fijó antes de tiempo la puntuación es la cota inferior, que da el mismo estado
+    return [int(score) for score in low], evaluations
+
+def cascade_hate_scores(items, thresholds, weights):
+    scores, evaluations = run_cascade(items, thresholds, weights)
+    return scores
+
+def cascade_hate_score(texts, thresholds, weights):
+    return cascade_hate_scores([texts], thresholds, weights)[0]
@@ -0,0 +1,152 @@
+from collections import Counter
+from django.apps import apps
+from django.conf import settings
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model._base import LinearClassifierMixin
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.preprocessing import normalize
+from .features import count_features
+import json
+import os
+import re
+import threading
+import numpy as np
+
+MODEL_NAMES = ['toxic', 'offensive', 'hate']
+
+def export_model(model, vectorizer, directory, model_version):
+    params = vectorizer.get_params()
+    if not isinstance(vectorizer, CountVectorizer) or params['analyzer'] != 'word' or params['input'] != 'content' \
+            or any(params[name] is not None for name in ('preprocessor', 'tokenizer', 'stop_words', 'strip_accents')):
+        raise ValueError(f'Unsupported vectorizer for the compact format: {vectorizer!r}')
+
+    # Tanto los modelos lineales como Naive Bayes multinomial se reducen a X @ W + b
+    if isinstance(model, LinearClassifierMixin):
+        weights, bias = model.coef_.T, model.intercept_
+        decision = 'binary' if model.coef_.shape[0] == 1 else 'argmax'
+    elif isinstance(model, MultinomialNB):
+        weights, bias = model.feature_log_prob_.T, model.class_log_prior_
+        decision = 'argmax'
+    else:
+        raise ValueError(f'Unsupported classifier for the compact format: {model!r}')
+
+    os.makedirs(directory, exist_ok=True)
+    terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+    for term, index in vectorizer.vocabulary_.items():
+        terms[index] = term
+
+    np.save(os.path.join(directory, 'terms.npy'), terms.astype(str))
+    np.save(os.path.join(directory, 'weights.npy'), np.ascontiguousarray(weights, dtype=np.float64))
+    np.save(os.path.join(directory, 'bias.npy'), np.asarray(bias, dtype=np.float64))
+    np.save(os.path.join(directory, 'classes.npy'), np.asarray(model.classes_))
+
+    tfidf = None
+    if isinstance(vectorizer, TfidfVectorizer):
+        np.save(os.path.join(directory, 'idf.npy'), vectorizer.idf_)
+        tfidf = {'norm': vectorizer.norm, 'sublinear_tf': vectorizer.sublinear_tf}
+
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({
+            'model_version': model_version,
+            'token_pattern': vectorizer.token_pattern,
+            'lowercase': vectorizer.lowercase,
+            'ngram_range': list(vectorizer.ngram_range),
+            'binary': vectorizer.binary,
+            'dtype': np.dtype(vectorizer.dtype).name,
+            'decision': decision,
+            'tfidf': tfidf,
+        }, f)
+
+class CompactModel:
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        self.vocabulary = {term: index for index, term in enumerate(np.load(os.path.join(directory, 'terms.npy')).tolist())}
+        self.weights = np.load(os.path.join(directory, 'weights.npy'), mmap_mode='r')
+        self.bias = np.load(os.path.join(directory, 'bias.npy'))
+        self.classes = np.load(os.path.join(directory, 'classes.npy'))
+        self.idf = np.load(os.path.join(directory, 'idf.npy')) if self.meta['tfidf'] else None
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.token_regex = re.compile(self.meta['token_pattern'])
+        self.min_n, self.max_n = self.meta['ngram_range']
+
+    @property
+    def analysis_signature(self):
+        return (self.meta['token_pattern'], self.meta['lowercase'], tuple(self.meta['ngram_range']))
+
+    # Misma tokenización que el analizador 'word' de CountVectorizer
+    def analyze(self, text):
+        if self.meta['lowercase']:
+            text = text.lower()
+        tokens = self.token_regex.findall(text)
+        if self.max_n == 1:
+            return tokens
+
+        original_tokens = tokens
+        min_n = self.min_n
+        if min_n == 1:
+            tokens = list(original_tokens)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(self.max_n + 1, len(original_tokens) + 1)):
+            for i in range(len(original_tokens) - n + 1):
+                tokens.append(' '.join(original_tokens[i:i + n]))
+        return tokens
+
+    def predict_counts(self, token_counts):
+        X = count_features(self.vocabulary, token_counts, self.dtype, self.meta['binary'])
+
+        if self.idf is not None:
+            X = X.astype(np.float64)
+            if self.meta['tfidf']['sublinear_tf']:
+                np.log(X.data, X.data)
+                X.data += 1.0
+            X.data *= self.idf[X.indices]
+            if self.meta['tfidf']['norm'] is not None:
+                X = normalize(X, norm=self.meta['tfidf']['norm'], copy=False)
+
+        scores = X @ self.weights + self.bias
+        if self.meta['decision'] == 'binary':
+            return self.classes[(scores.ravel() > 0).astype(int)]
+        return self.classes[np.argmax(scores, axis=1)]
+
+    def predict(self, texts):
+        return self.predict_counts([Counter(self.analyze(text)) for text in texts])
+
+def predict_compact(compact_models, texts):
+    predictions = [None] * len(compact_models)
+
+    # Igual que en transform_texts, una sola tokenización por configuración de análisis
+    groups = {}
+    for position, compact_model in enumerate(compact_models):
+        groups.setdefault(compact_model.analysis_signature, []).append(position)
+
+    for positions in groups.values():
+        token_counts = [Counter(compact_models[positions[0]].analyze(text)) for text in texts]
+        for position in positions:
+            predictions[position] = compact_models[position].predict_counts(token_counts)
+
+    return np.column_stack(predictions)
+
+compact_models_lock = threading.Lock()
+loaded_compact_models = {}
+
+def get_compact_models():
+    if not settings.MODERATION_COMPACT_MODELS:
+        return None
+
+    model_version = apps.get_app_config('ai_models').model_version
+    key = (settings.MODERATION_COMPACT_DIR, model_version)
+    with compact_models_lock:
+        if key not in loaded_compact_models:
+            directories = [os.path.join(settings.MODERATION_COMPACT_DIR, name) for name in MODEL_NAMES]
+            compact_models = None
+            if all(os.path.exists(os.path.join(directory, 'meta.json')) for directory in directories):
+                compact_models = [CompactModel(directory) for directory in directories]
+                # Una exportación de otros artefactos joblib no se usa
+                if any(compact_model.meta['model_version'] != model_version for compact_model in compact_models):
+                    compact_models = None
+            loaded_compact_models[key] = compact_models
+        return loaded_compact_models[key]
@@ -0,0 +1,62 @@
+from collections import Counter
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+import numpy as np
+import scipy.sparse as sp
+
+# Parámetros de CountVectorizer que determinan los tokens generados a partir del texto
+ANALYSIS_PARAMS = [
+    'input', 'encoding', 'decode_error', 'strip_accents', 'lowercase',
+    'preprocessor', 'tokenizer', 'stop_words', 'token_pattern', 'ngram_range', 'analyzer',
+]
+
+def analysis_signature(vectorizer):
+    params = vectorizer.get_params()
+    return tuple(repr(params.get(name)) for name in ANALYSIS_PARAMS)
+
+def count_features(vocabulary, token_counts, dtype, binary):
+    indices = []
+    values = []
+    indptr = [0]
+
+    for counts in token_counts:
+        for token, count in counts.items():
+            index = vocabulary.get(token)
+            if index is not None:
+                indices.append(index)
+                values.append(count)
+        indptr.append(len(indices))
+
+    X = sp.csr_matrix(
+        (np.asarray(values, dtype=dtype), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+        shape=(len(token_counts), len(vocabulary))
+    )
+    X.sort_indices()
+
+    if binary:
+        X.data.fill(1)
+    return X
+
+def vectorize_counts(vectorizer, token_counts):
+    X = count_features(vectorizer.vocabulary_, token_counts, vectorizer.dtype, vectorizer.binary)
+    if isinstance(vectorizer, TfidfVectorizer):
+        X = vectorizer._tfidf.transform(X, copy=False)
+    return X
+
+def transform_texts(vectorizers, texts):
+    matrices = [None] * len(vectorizers)
+
+    # Los vectorizadores que analizan el texto igual comparten una única tokenización
+    groups = {}
+    for position, vectorizer in enumerate(vectorizers):
+        if isinstance(vectorizer, CountVectorizer):
+            groups.setdefault(analysis_signature(vectorizer), []).append(position)
+        else:
+            matrices[position] = vectorizer.transform(texts)
+
+    for positions in groups.values():
+        analyzer = vectorizers[positions[0]].build_analyzer()
+        token_counts = [Counter(analyzer(text)) for text in texts]
+        for position in positions:
+            matrices[position] = vectorize_counts(vectorizers[position], token_counts)
+
+    return matrices
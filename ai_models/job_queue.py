@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.utils import timezone
+import time
+import uuid
+
+# Cola de trabajos sobre una tabla con status, claimToken, createdAt, startedAt, finishedAt y error,
+# compartida por la moderación diferida y el análisis de actuaciones
+
+def enqueue_job(model, lookup, **fields):
+    job, created = model.objects.update_or_create(
+        **lookup,
+        defaults={
+            'status': model.Status.PENDING,
+            'claimToken': '',
+            'startedAt': None,
+            'finishedAt': None,
+            'error': '',
+            **fields,
+        }
+    )
+    return job
+
+def requeue_stale_jobs(model, stale_after):
+    return model.objects.filter(
+        status=model.Status.RUNNING,
+        startedAt__lt=timezone.now() - timedelta(seconds=stale_after)
+    ).update(status=model.Status.PENDING, claimToken='')
+
+def requeue_failed_jobs(model):
+    return model.objects.filter(status=model.Status.FAILED).update(status=model.Status.PENDING, claimToken='', error='')
+
+def pending_job_ids(model, limit):
+    return list(
+        model.objects.filter(status=model.Status.PENDING)
+        .order_by('createdAt')
+        .values_list('id', flat=True)[:limit]
+    )
+
+def claim(model, job_ids, token=None):
+    # Otro worker puede reclamar los mismos trabajos; solo nos quedamos con los que marque nuestro token
+    token = token or uuid.uuid4().hex
+    model.objects.filter(id__in=job_ids, status=model.Status.PENDING).update(
+        status=model.Status.RUNNING, claimToken=token, startedAt=timezone.now()
+    )
+    return model.objects.filter(claimToken=token)
+
+def claim_jobs(model, batch_size):
+    pending_ids = pending_job_ids(model, batch_size)
+    if not pending_ids:
+        return model.objects.none()
+    return claim(model, pending_ids)
+
+def claim_job(model):
+    # Un solo trabajo; si otro worker se adelanta se prueba con el siguiente
+    for job_id in pending_job_ids(model, 10):
+        claimed = claim(model, [job_id])
+        if claimed.exists():
+            return claimed
+    return None
+
+def run_worker(model, step, stale_after, once=False, interval=1.0):
+    # step() procesa lo que haya pendiente y devuelve si ha encontrado algo que hacer
+    while True:
+        requeue_stale_jobs(model, stale_after)
+        if step():
+            continue
+        if once:
+            break
+        time.sleep(interval)
@@ -0,0 +1,73 @@
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from . import job_queue
+from .job_queue import enqueue_job
+from .cascade import cascade_hate_scores
+from .moderation import score_texts, new_hate_score, moderation_state, REVIEW_THRESHOLDS, NEW_THRESHOLDS, REVIEW_WEIGHTS, NEW_WEIGHTS
+
+def enqueue_moderation(review=None, new=None):
+    ModerationJob = apps.get_model('ai_models', 'ModerationJob')
+    return enqueue_job(ModerationJob, {'review': review} if review is not None else {'new': new})
+
+def claim_jobs(batch_size):
+    ModerationJob = apps.get_model('ai_models', 'ModerationJob')
+    return list(job_queue.claim_jobs(ModerationJob, batch_size).select_related('review', 'new'))
+
+def apply_moderation(instance, hate_score, thresholds):
+    # Si un administrador ya lo ha resuelto a mano no se toca
+    if instance.state != instance.State.IN_REVIEW:
+        return
+
+    instance.hateScore = hate_score
+    instance.state = moderation_state(hate_score, thresholds)
+    if instance.state == instance.State.PUBLISHED:
+        instance.publicationDate = timezone.now()
+    instance.save()
+
+def job_hate_scores(jobs):
+    review_jobs = [job for job in jobs if job.review_id]
+    new_jobs = [job for job in jobs if not job.review_id]
+
+    if settings.MODERATION_CASCADE:
+        review_scores = cascade_hate_scores([(job.review.body,) for job in review_jobs], REVIEW_THRESHOLDS, REVIEW_WEIGHTS)
+        new_scores = cascade_hate_scores([(job.new.body, job.new.title) for job in new_jobs], NEW_THRESHOLDS, NEW_WEIGHTS)
+    else:
+        # Un único score_texts para todo el lote
+        scores = score_texts([job.review.body for job in review_jobs] + [text for job in new_jobs for text in (job.new.body, job.new.title)])
+        review_scores = scores[:len(review_jobs)]
+        new_texts_scores = iter(scores[len(review_jobs):])
+        new_scores = [new_hate_score(body_score, title_score) for body_score, title_score in zip(new_texts_scores, new_texts_scores)]
+
+    hate_scores = dict(zip([job.id for job in review_jobs], review_scores))
+    hate_scores.update(zip([job.id for job in new_jobs], new_scores))
+    return hate_scores
+
+def run_moderation_jobs(batch_size=100):
+    ModerationJob = apps.get_model('ai_models', 'ModerationJob')
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    try:
+        hate_scores = job_hate_scores(jobs)
+    except Exception as e:
+        ModerationJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=ModerationJob.Status.FAILED, error=str(e), finishedAt=timezone.now()
+        )
+        raise
+
+    for job in jobs:
+        try:
+            if job.review_id:
+                apply_moderation(job.review, hate_scores[job.id], REVIEW_THRESHOLDS)
+            else:
+                apply_moderation(job.new, hate_scores[job.id], NEW_THRESHOLDS)
+            job.status = ModerationJob.Status.DONE
+        except Exception as e:
+            job.status = ModerationJob.Status.FAILED
+            job.error = str(e)
+        job.finishedAt = timezone.now()
+        job.save(update_fields=['status', 'error', 'finishedAt'])
+
+    return len(jobs)
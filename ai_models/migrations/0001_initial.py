@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedHateScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('textHash', models.CharField(max_length=64)),
+                ('modelVersion', models.CharField(max_length=40)),
+                ('hateScore', models.IntegerField()),
+            ],
+            options={
+                'unique_together': {('textHash', 'modelVersion')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_models', '0001_initial'),
+        ('movies', '0017_alter_actor_birthday_alter_review_publicationdate'),
+        ('news', '0015_alter_new_hatescore_alter_new_title'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=50)),
+                ('claimToken', models.CharField(blank=True, max_length=32)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('startedAt', models.DateTimeField(blank=True, null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('new', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='moderation_job', to='news.new')),
+                ('review', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='moderation_job', to='movies.review')),
+            ],
+        ),
+    ]
@@ -1,3 +1,36 @@
 from django.db import models
 
-# Create your models here.
+class CachedHateScore(models.Model):
+    textHash = models.CharField(max_length=64)
+    modelVersion = models.CharField(max_length=40)
+    hateScore = models.IntegerField()
+
+    class Meta:
+        unique_together = ('textHash', 'modelVersion')
+
+    def __str__(self):
+        return f'{self.textHash[:12]}@{self.modelVersion[:8]}: {self.hateScore}'
+
+class ModerationJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    review = models.OneToOneField('movies.Review', on_delete=models.CASCADE, null=True, blank=True, related_name='moderation_job')
+    new = models.OneToOneField('news.New', on_delete=models.CASCADE, null=True, blank=True, related_name='moderation_job')
+    status = models.CharField(
+        max_length=50,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    claimToken = models.CharField(max_length=32, blank=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    startedAt = models.DateTimeField(blank=True, null=True)
+    finishedAt = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        target = f'review {self.review_id}' if self.review_id else f'new {self.new_id}'
+        return f'{self.status}: moderation of {target}'
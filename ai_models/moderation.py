@@ -0,0 +1,83 @@
+from django.apps import apps
+from django.conf import settings
+from .cache import score_cache, text_hash
+from .compact import get_compact_models, predict_compact
+from .features import transform_texts
+from .server import remote_predict
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (umbral de revisión, umbral de prohibición)
+REVIEW_THRESHOLDS = (1, 3)
+NEW_THRESHOLDS = (3, 7)
+
+# Peso de cada texto en la puntuación: (cuerpo,) en reseñas y (cuerpo, título) en noticias
+REVIEW_WEIGHTS = (1,)
+NEW_WEIGHTS = (2, 1)
+
+def get_moderation_models():
+    my_app_config = apps.get_app_config('ai_models')
+    return [
+        (my_app_config.toxic_model, my_app_config.toxic_vectorizer),
+        (my_app_config.offensive_model, my_app_config.offensive_vectorizer),
+        (my_app_config.hate_model, my_app_config.hate_vectorizer),
+    ]
+
+def predict_per_model(texts):
+    # Con la exportación compacta activada y al día se evita pasar por sklearn
+    compact_models = get_compact_models()
+    if compact_models:
+        return predict_compact(compact_models, texts)
+
+    moderation_models = get_moderation_models()
+    matrices = transform_texts([vectorizer for model, vectorizer in moderation_models], texts)
+
+    # Un único predict por modelo para todo el lote
+    predictions = [model.predict(texts_vectorized) for (model, vectorizer), texts_vectorized in zip(moderation_models, matrices)]
+    return np.column_stack(predictions)
+
+def predict_texts(texts):
+    socket_path = getattr(settings, 'MODERATION_SOCKET', '')
+    if socket_path:
+        try:
+            predictions = remote_predict(texts, socket_path, settings.MODERATION_SOCKET_TIMEOUT)
+            return np.array(predictions).sum(axis=1).tolist()
+        except (OSError, RuntimeError, ValueError) as e:
+            # Sin servidor de inferencia se puntúa en el propio proceso
+            logger.warning('Inference server unavailable (%s), scoring in process', e)
+
+    return predict_per_model(texts).sum(axis=1).tolist()
+
+def score_texts(texts):
+    texts = list(texts)
+    if not texts:
+        return []
+
+    hashes = [text_hash(text) for text in texts]
+    scores = score_cache.get_many(hashes)
+
+    # Solo se infieren los textos que no estaban en caché, una vez cada uno
+    pending = {h: text for h, text in zip(hashes, texts) if h not in scores}
+    if pending:
+        computed = dict(zip(pending.keys(), predict_texts(list(pending.values()))))
+        score_cache.set_many(computed)
+        scores.update(computed)
+
+    return [scores[h] for h in hashes]
+
+def calculate_hate_score(body):
+    return score_texts([body])[0]
+
+def new_hate_score(body_score, title_score):
+    body_weight, title_weight = NEW_WEIGHTS
+    return body_weight*body_score + title_weight*title_score
+
+def moderation_state(hate_score, thresholds):
+    review_threshold, forbidden_threshold = thresholds
+    if hate_score < review_threshold:
+        return 'PUBLISHED'
+    elif hate_score < forbidden_threshold:
+        return 'IN_REVIEW'
+    return 'FORBIDDEN'
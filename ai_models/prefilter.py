@@ -0,0 +1,73 @@
+from collections import deque
+from django.conf import settings
+import threading
+import unicodedata
+
+def normalize_for_lexicon(text):
+    # Sin tildes ni mayúsculas, para que 'Imbécil' e 'imbecil' coincidan con el mismo término
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+class LexiconAutomaton:
+    # Autómata de Aho-Corasick: una sola pasada por el texto sea cual sea el número de términos
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [False]
+
+        for term in terms:
+            term = normalize_for_lexicon(term.strip())
+            if not term:
+                continue
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(False)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] = True
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] or self.output[self.fail[next_state]]
+
+    def matches(self, text):
+        state = 0
+        for char in normalize_for_lexicon(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                return True
+        return False
+
+def load_lexicon(path):
+    with open(path, encoding='utf-8') as f:
+        return LexiconAutomaton(line for line in f if not line.startswith('#'))
+
+lexicon_lock = threading.Lock()
+loaded_lexicons = {}
+
+def get_lexicon():
+    path = settings.MODERATION_LEXICON_PATH
+    with lexicon_lock:
+        if path not in loaded_lexicons:
+            loaded_lexicons[path] = load_lexicon(path)
+        return loaded_lexicons[path]
+
+def is_obviously_clean(text, lexicon=None):
+    # Solo textos cortos: en los largos el contexto pesa más que las palabras sueltas
+    if len(text) > settings.MODERATION_PREFILTER_MAX_LENGTH:
+        return False
+    if lexicon is None:
+        lexicon = get_lexicon()
+    return not lexicon.matches(text)
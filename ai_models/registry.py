@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from django.conf import settings
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def file_stamp(paths):
+    stats = [os.stat(path) for path in paths]
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+def file_digest(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+class RegistryEntry:
+    def __init__(self, paths):
+        self.paths = paths
+        self.model = None
+        self.stamp = None
+        self.digest = None
+        self.size = 0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.last_load_seconds = 0.0
+        self.total_load_seconds = 0.0
+        self.lock = threading.Lock()
+
+class ModelRegistry:
+    # Sin max_bytes los modelos se quedan cargados; con él se expulsan los menos usados recientemente
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry(self, key, paths):
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = RegistryEntry(list(paths))
+            return self.entries[key]
+
+    def touch(self, key, hit):
+        with self.lock:
+            self.entries.move_to_end(key)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, paths, loader):
+        entry = self.entry(key, paths)
+        stamp = file_stamp(entry.paths)
+
+        with entry.lock:
+            model = entry.model
+            if model is not None and entry.stamp == stamp:
+                entry.hits += 1
+                self.touch(key, hit=True)
+                return model
+
+            # Si solo ha cambiado la fecha (un touch, una copia) el contenido decide si se recarga
+            digest = file_digest(entry.paths) if settings.MODEL_REGISTRY_VERIFY_HASH else None
+            if model is not None and digest is not None and digest == entry.digest:
+                entry.stamp = stamp
+                entry.hits += 1
+                self.touch(key, hit=True)
+                return model
+
+            start = time.perf_counter()
+            model = loader()
+            entry.model = model
+            entry.last_load_seconds = time.perf_counter() - start
+            entry.total_load_seconds += entry.last_load_seconds
+            entry.loads += 1
+            entry.stamp = stamp
+            entry.digest = digest
+            # El tamaño en disco sirve como estimación de la memoria que ocupa el modelo
+            entry.size = sum(size for mtime, size in stamp)
+            logger.info('Loaded %s in %.3f s (load %d)', key, entry.last_load_seconds, entry.loads)
+
+        self.touch(key, hit=False)
+        self.evict(keep=key)
+        return model
+
+    def loaded_bytes(self):
+        with self.lock:
+            return sum(entry.size for entry in self.entries.values() if entry.model is not None)
+
+    def is_loaded(self, key):
+        with self.lock:
+            return key in self.entries and self.entries[key].model is not None
+
+    def fits(self, size):
+        return self.max_bytes is None or self.loaded_bytes() + size <= self.max_bytes
+
+    def evict(self, keep):
+        if self.max_bytes is None:
+            return
+
+        with self.lock:
+            loaded = [(key, entry) for key, entry in self.entries.items() if entry.model is not None]
+        total = sum(entry.size for key, entry in loaded)
+
+        # Se recorren de menos a más reciente; el recién cargado se queda aunque no quepa
+        for key, entry in loaded:
+            if total <= self.max_bytes:
+                break
+            # Un modelo que otro hilo está cargando o comprobando ahora mismo no se expulsa
+            if key == keep or not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if entry.model is None:
+                    continue
+                entry.model = None
+                entry.evictions += 1
+            finally:
+                entry.lock.release()
+            with self.lock:
+                self.evictions += 1
+            total -= entry.size
+            logger.info('Evicted %s (%d bytes) to stay within %d bytes', key, entry.size, self.max_bytes)
+
+    def counters(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def stats(self):
+        with self.lock:
+            entries = list(self.entries.items())
+        return {
+            key: {
+                'loaded': entry.model is not None,
+                'size': entry.size,
+                'loads': entry.loads,
+                'hits': entry.hits,
+                'evictions': entry.evictions,
+                'last_load_seconds': entry.last_load_seconds,
+                'total_load_seconds': entry.total_load_seconds,
+            }
+            for key, entry in entries
+        }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+model_registry = ModelRegistry()
+actor_model_registry = ModelRegistry(max_bytes=settings.ACTOR_MODEL_CACHE_MB * 2**20)
@@ -0,0 +1,135 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+HEADER = struct.Struct('!I')
+
+def receive_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed')
+        data += chunk
+    return bytes(data)
+
+def send_message(sock, payload):
+    data = json.dumps(payload).encode('utf-8')
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+def receive_message(sock):
+    (length,) = HEADER.unpack(receive_exactly(sock, HEADER.size))
+    return json.loads(receive_exactly(sock, length))
+
+def remote_predict(texts, socket_path, timeout):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        send_message(sock, {'texts': texts})
+        response = receive_message(sock)
+
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response['predictions']
+
+class PendingRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.predictions = None
+        self.error = None
+        self.done = threading.Event()
+
+class MicroBatcher:
+    def __init__(self, predict, window, max_batch):
+        self.predict = predict
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+
+    def submit(self, texts):
+        request = PendingRequest(texts)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.predictions
+
+    def stop(self):
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            first = self.requests.get()
+            if first is None:
+                return
+
+            # Se agrupan las peticiones que llegan dentro de la ventana de tiempo
+            batch = [first]
+            batch_size = len(first.texts)
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while batch_size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                batch_size += len(request.texts)
+
+            self.process(batch)
+            if stopping:
+                return
+
+    def process(self, batch):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            predictions = self.predict(texts)
+            start = 0
+            for request in batch:
+                request.predictions = predictions[start:start + len(request.texts)]
+                start += len(request.texts)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+class InferenceRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                predictions = self.server.batcher.submit(message['texts'])
+                send_message(self.request, {'predictions': predictions})
+            except Exception as e:
+                send_message(self.request, {'error': str(e)})
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, batcher):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = batcher
+        super().__init__(socket_path, InferenceRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
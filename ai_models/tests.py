@@ -1,3 +1,531 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.apps import apps
+from django.urls import reverse
+from django.contrib.auth.models import User, Group
+from djmoney.money import Money
+from unittest.mock import patch, MagicMock
+from django.test import override_settings
+from ai_models.apps import AiModelsConfig
+from ai_models.moderation import score_texts, calculate_hate_score
+from ai_models.cache import score_cache, normalize_text, text_hash
+from ai_models.models import CachedHateScore, ModerationJob
+from ai_models.moderation import moderation_state, REVIEW_THRESHOLDS, NEW_THRESHOLDS
+from ai_models.jobs import run_moderation_jobs
+from ai_models.job_queue import requeue_stale_jobs
+from ai_models.server import InferenceServer, MicroBatcher, remote_predict
+from ai_models.moderation import predict_texts
+from ai_models.features import transform_texts
+from ai_models.compact import CompactModel, export_model
+from ai_models.moderation import predict_per_model, REVIEW_WEIGHTS, NEW_WEIGHTS
+from ai_models.cascade import run_cascade
+from ai_models.prefilter import LexiconAutomaton, is_obviously_clean
+from ai_models.registry import ModelRegistry
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+from joblib import load
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.utils import timezone
+import tempfile
+import threading
+import os
+from movies.models import Movie, Review
+from news.models import New, Category
+from users.models import Strike
+import ai_models
+import numpy as np
 
-# Create your tests here.
+# --------------------------------------------------- Puntuación de odio por lotes --------------------------------------------------- #
+class ScoreTextsTest(TestCase):
+    def setUp(self):
+        self.models = []
+        for predictions in ([1, 0, 1], [1, 0, 0], [0, 0, 1]):
+            model = MagicMock()
+            model.predict.return_value = np.array(predictions)
+            vectorizer = MagicMock()
+            self.models.append((model, vectorizer))
+
+        self.get_moderation_models_patcher = patch('ai_models.moderation.get_moderation_models', return_value=self.models)
+        self.get_moderation_models_patcher.start()
+        score_cache.clear()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_score_texts_sums_models(self):
+        scores = score_texts(['a', 'b', 'c'])
+        self.assertEqual(scores, [2, 0, 2])
+
+    def test_score_texts_single_call_per_model(self):
+        texts = ['a', 'b', 'c']
+        score_texts(texts)
+        for model, vectorizer in self.models:
+            vectorizer.transform.assert_called_once_with(texts)
+            model.predict.assert_called_once_with(vectorizer.transform.return_value)
+
+    def test_score_texts_empty(self):
+        self.assertEqual(score_texts([]), [])
+        for model, vectorizer in self.models:
+            vectorizer.transform.assert_not_called()
+
+    def test_calculate_hate_score(self):
+        for model, vectorizer in self.models:
+            model.predict.return_value = np.array([1])
+        self.assertEqual(calculate_hate_score('a'), 3)
+
+# --------------------------------------------------- Carga perezosa de modelos --------------------------------------------------- #
+class LazyModelLoadingTest(TestCase):
+    def setUp(self):
+        self.config = AiModelsConfig('ai_models', ai_models)
+
+    @patch('ai_models.apps.load')
+    def test_models_not_loaded_on_ready(self, mock_load):
+        self.config.ready()
+        mock_load.assert_not_called()
+
+    @override_settings(AI_MODELS_MMAP_MODE='r')
+    @patch('ai_models.apps.load')
+    def test_model_loaded_once_on_first_use(self, mock_load):
+        self.config.toxic_model
+        self.config.toxic_model
+        mock_load.assert_called_once_with(self.config.toxic_model_path, mmap_mode='r')
+
+    @patch('ai_models.apps.load')
+    def test_warm_up_loads_every_artifact(self, mock_load):
+        self.config.warm_up()
+        self.assertEqual(mock_load.call_count, len(AiModelsConfig.artifacts))
+
+# --------------------------------------------------- Caché de puntuaciones --------------------------------------------------- #
+class ScoreCacheTest(TestCase):
+    def setUp(self):
+        self.predict_texts_patcher = patch('ai_models.moderation.predict_texts', side_effect=lambda texts: [len(text) for text in texts])
+        self.mock_predict_texts = self.predict_texts_patcher.start()
+        score_cache.clear()
+
+    def tearDown(self):
+        patch.stopall()
+        score_cache.clear()
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('  Qué   PELI\n mala '), 'qué peli mala')
+
+    def test_repeated_text_skips_inference(self):
+        self.assertEqual(score_texts(['hola', 'adios']), [4, 5])
+        self.assertEqual(score_texts(['HOLA ', 'adios']), [4, 5])
+        self.mock_predict_texts.assert_called_once_with(['hola', 'adios'])
+
+    def test_duplicates_in_batch_inferred_once(self):
+        self.assertEqual(score_texts(['hola', 'hola', 'Hola']), [4, 4, 4])
+        self.assertEqual(len(self.mock_predict_texts.call_args[0][0]), 1)
+
+    def test_database_tier(self):
+        score_texts(['hola'])
+        self.assertEqual(CachedHateScore.objects.count(), 1)
+        score_cache.clear()
+        self.assertEqual(score_texts(['hola']), [4])
+        self.assertEqual(self.mock_predict_texts.call_count, 1)
+
+    def test_model_version_change_invalidates(self):
+        score_texts(['hola'])
+        with patch.object(score_cache, 'model_version', return_value='other'):
+            score_texts(['hola'])
+        self.assertEqual(self.mock_predict_texts.call_count, 2)
+
+# --------------------------------------------------- Moderación diferida --------------------------------------------------- #
+class ModerationStateTest(TestCase):
+    def test_review_thresholds(self):
+        self.assertEqual(moderation_state(0, REVIEW_THRESHOLDS), Review.State.PUBLISHED)
+        self.assertEqual(moderation_state(1, REVIEW_THRESHOLDS), Review.State.IN_REVIEW)
+        self.assertEqual(moderation_state(2, REVIEW_THRESHOLDS), Review.State.IN_REVIEW)
+        self.assertEqual(moderation_state(3, REVIEW_THRESHOLDS), Review.State.FORBIDDEN)
+
+    def test_new_thresholds(self):
+        self.assertEqual(moderation_state(2, NEW_THRESHOLDS), New.State.PUBLISHED)
+        self.assertEqual(moderation_state(3, NEW_THRESHOLDS), New.State.IN_REVIEW)
+        self.assertEqual(moderation_state(6, NEW_THRESHOLDS), New.State.IN_REVIEW)
+        self.assertEqual(moderation_state(7, NEW_THRESHOLDS), New.State.FORBIDDEN)
+
+@override_settings(MODERATION_DEFERRED=True)
+class DeferredModerationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='12345', email='testuser@example.com')
+        self.user.groups.add(Group.objects.create(name='Writer'))
+        self.category = Category.objects.create(name='Tech')
+        self.movie = Movie.objects.create(
+            title="Test Movie",
+            director="Director 1",
+            releaseYear=2023,
+            image="http://example.com/movie_image.jpg",
+            duration=120,
+            country="Country 1",
+            budget=Money(100000, 'USD'),
+            revenue=Money(150000, 'USD'),
+        )
+        self.client.login(username='testuser', password='12345')
+
+    def tearDown(self):
+        Movie.objects.all().delete()
+
+    @patch('movies.views.calculate_hate_score')
+    def test_create_review_is_deferred(self, mock_calculate_hate_score):
+        response = self.client.post(reverse('publish_review', args=[self.movie.id]), {'body': 'Good review', 'rating': 5})
+        self.assertEqual(response.status_code, 302)
+        mock_calculate_hate_score.assert_not_called()
+        review = Review.objects.get(movie=self.movie)
+        self.assertEqual(review.state, Review.State.IN_REVIEW)
+        self.assertEqual(review.moderation_job.status, ModerationJob.Status.PENDING)
+
+    @patch('news.views.score_texts')
+    def test_create_new_is_deferred(self, mock_score_texts):
+        response = self.client.post(reverse('publish_new'), {
+            'title': 'Good new',
+            'body': 'Test Body',
+            'photo': 'test.jpg',
+            'category': self.category.id
+        })
+        self.assertEqual(response.status_code, 302)
+        mock_score_texts.assert_not_called()
+        new = New.objects.get(title='Good new')
+        self.assertEqual(new.state, New.State.IN_REVIEW)
+        self.assertEqual(new.moderation_job.status, ModerationJob.Status.PENDING)
+
+    @patch('movies.views.enqueue_moderation', side_effect=RuntimeError('database is locked'))
+    def test_review_is_not_saved_without_its_job(self, mock_enqueue_moderation):
+        with self.assertRaises(RuntimeError):
+            self.client.post(reverse('publish_review', args=[self.movie.id]), {'body': 'Good review', 'rating': 5})
+        self.assertFalse(Review.objects.filter(movie=self.movie).exists())
+
+    @patch('ai_models.jobs.score_texts', return_value=[0])
+    def test_stale_jobs_are_requeued(self, mock_score_texts):
+        self.client.post(reverse('publish_review', args=[self.movie.id]), {'body': 'Good review', 'rating': 5})
+        ModerationJob.objects.update(status=ModerationJob.Status.RUNNING, claimToken='lost', startedAt=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_jobs(ModerationJob, 600), 1)
+        self.assertEqual(run_moderation_jobs(), 1)
+        self.assertEqual(Review.objects.get(movie=self.movie).state, Review.State.PUBLISHED)
+
+    @patch('ai_models.jobs.score_texts')
+    def test_worker_applies_thresholds(self, mock_score_texts):
+        for body in ['clean', 'mild', 'hateful']:
+            self.client.post(reverse('publish_review', args=[self.movie.id]), {'body': body, 'rating': 3})
+        self.client.post(reverse('publish_new'), {'title': 'Title', 'body': 'Body', 'photo': 'test.jpg', 'category': self.category.id})
+
+        # Reseñas: 0, 2, 3; noticia: 2*3 + 1 = 7
+        mock_score_texts.return_value = [0, 2, 3, 3, 1]
+        self.assertEqual(run_moderation_jobs(), 4)
+        mock_score_texts.assert_called_once_with(['clean', 'mild', 'hateful', 'Body', 'Title'])
+
+        self.assertEqual(Review.objects.get(body='clean').state, Review.State.PUBLISHED)
+        self.assertEqual(Review.objects.get(body='mild').state, Review.State.IN_REVIEW)
+        forbidden_review = Review.objects.get(body='hateful')
+        self.assertEqual(forbidden_review.state, Review.State.FORBIDDEN)
+        self.assertEqual(forbidden_review.hateScore, 3)
+        self.assertTrue(Strike.objects.filter(review=forbidden_review).exists())
+
+        new = New.objects.get(title='Title')
+        self.assertEqual(new.state, New.State.FORBIDDEN)
+        self.assertEqual(new.hateScore, 7)
+        self.assertTrue(Strike.objects.filter(new=new).exists())
+
+        self.assertFalse(ModerationJob.objects.exclude(status=ModerationJob.Status.DONE).exists())
+        self.assertEqual(run_moderation_jobs(), 0)
+
+# --------------------------------------------------- Servidor de inferencia --------------------------------------------------- #
+class InferenceServerTest(TestCase):
+    def setUp(self):
+        self.batches = []
+
+        def predict(texts):
+            self.batches.append(texts)
+            return [[len(text), 0, 1] for text in texts]
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.socket_path = os.path.join(self.directory.name, 'moderation.sock')
+        self.batcher = MicroBatcher(predict, window=0.05, max_batch=256)
+        threading.Thread(target=self.batcher.run, daemon=True).start()
+        self.server = InferenceServer(self.socket_path, self.batcher)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.batcher.stop()
+
+    def test_remote_predict(self):
+        self.assertEqual(remote_predict(['ab', 'abc'], self.socket_path, timeout=2), [[2, 0, 1], [3, 0, 1]])
+
+    def test_concurrent_requests_are_batched(self):
+        texts = [['a' * i] for i in range(1, 9)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda t: remote_predict(t, self.socket_path, timeout=2), texts))
+
+        self.assertEqual(results, [[[i, 0, 1]] for i in range(1, 9)])
+        self.assertLess(len(self.batches), len(texts))
+
+    def test_predict_texts_uses_server(self):
+        with override_settings(MODERATION_SOCKET=self.socket_path):
+            self.assertEqual(predict_texts(['abcd']), [5])
+
+    @patch('ai_models.moderation.predict_per_model', return_value=np.array([[1, 1, 0]]))
+    def test_predict_texts_falls_back_without_server(self, mock_predict_per_model):
+        with override_settings(MODERATION_SOCKET=self.socket_path + '.missing'):
+            self.assertEqual(predict_texts(['abcd']), [2])
+        mock_predict_per_model.assert_called_once_with(['abcd'])
+
+# --------------------------------------------------- Tokenización compartida --------------------------------------------------- #
+class SharedTokenizationTest(TestCase):
+    texts = [
+        'No me ha gustado la peli',
+        'basura de peli, espantosa, lo PEOR!',
+        'ASCO de premios como ha podido ganar ese inutil?? no me lo puedo creer BASTA YA',
+        'La entrega de premios me ha parecido injusta. ¡Debería haber ganado Will Smith!',
+        'Qué injusticia',
+        '',
+        'a',
+        '你好 Здравейте <script>alert("hola")</script> 😀 12 345 peli peli peli',
+    ]
+
+    def assertSameMatrix(self, expected, actual):
+        self.assertEqual(expected.shape, actual.shape)
+        self.assertEqual(expected.dtype, actual.dtype)
+        self.assertEqual((expected != actual).nnz, 0)
+
+    def test_matches_vectorizer_transform(self):
+        config = apps.get_app_config('ai_models')
+        vectorizers = [load(path) for path in (config.toxic_vectorizer_path, config.offensive_vectorizer_path, config.hate_vectorizer_path)]
+
+        for vectorizer, matrix in zip(vectorizers, transform_texts(vectorizers, self.texts)):
+            self.assertSameMatrix(vectorizer.transform(self.texts), matrix)
+
+    def test_matches_tfidf_and_mixed_analyzers(self):
+        corpus = ['peli mala mala', 'peli buena', 'premios injustos', 'qué buena peli']
+        vectorizers = [
+            TfidfVectorizer().fit(corpus),
+            TfidfVectorizer(ngram_range=(1, 2), binary=True).fit(corpus),
+            TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 3)).fit(corpus),
+        ]
+
+        for vectorizer, matrix in zip(vectorizers, transform_texts(vectorizers, self.texts)):
+            self.assertEqual((abs(vectorizer.transform(self.texts) - matrix) > 1e-12).nnz, 0)
+
+# --------------------------------------------------- Modelos compactos --------------------------------------------------- #
+class CompactModelTest(TestCase):
+    corpus = ['peli mala mala', 'peli buena', 'premios injustos', 'qué buena peli', 'basura de peli', 'me ha encantado']
+    labels = [1, 0, 2, 0, 2, 0]
+    texts = SharedTokenizationTest.texts + ['Qué peli tan MALA', 'premios, premios y más premios']
+
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+
+    def export(self, model, vectorizer, name='toxic', model_version='v1'):
+        directory = os.path.join(self.output.name, name)
+        export_model(model, vectorizer, directory, model_version)
+        return CompactModel(directory)
+
+    def test_matches_sklearn_predictions(self):
+        cases = [
+            (LogisticRegression(), CountVectorizer(), [label > 0 for label in self.labels]),
+            (LogisticRegression(), CountVectorizer(ngram_range=(1, 2), binary=True), self.labels),
+            (MultinomialNB(), CountVectorizer(), self.labels),
+            (LogisticRegression(), TfidfVectorizer(sublinear_tf=True), self.labels),
+        ]
+
+        for model, vectorizer, labels in cases:
+            model.fit(vectorizer.fit_transform(self.corpus), labels)
+            compact_model = self.export(model, vectorizer)
+            self.assertEqual(compact_model.predict(self.texts).tolist(), model.predict(vectorizer.transform(self.texts)).tolist())
+
+    def test_rejects_unsupported_vectorizer(self):
+        vectorizer = CountVectorizer(analyzer='char_wb')
+        model = MultinomialNB().fit(vectorizer.fit_transform(self.corpus), self.labels)
+        with self.assertRaises(ValueError):
+            self.export(model, vectorizer)
+
+    def test_used_only_when_enabled_and_up_to_date(self):
+        vectorizer = CountVectorizer().fit(self.corpus)
+        model = MultinomialNB().fit(vectorizer.transform(self.corpus), self.labels)
+        moderation_models = [(model, vectorizer)] * 3
+        expected = np.column_stack([model.predict(vectorizer.transform(self.texts))] * 3)
+
+        model_version = apps.get_app_config('ai_models').model_version
+        for name in ['toxic', 'offensive', 'hate']:
+            self.export(model, vectorizer, name, model_version)
+
+        with override_settings(MODERATION_COMPACT_MODELS=True, MODERATION_COMPACT_DIR=self.output.name):
+            with patch('ai_models.moderation.get_moderation_models') as mock_models:
+                np.testing.assert_array_equal(predict_per_model(self.texts), expected)
+                mock_models.assert_not_called()
+
+        # Una exportación de otra versión de los artefactos se ignora
+        for name in ['toxic', 'offensive', 'hate']:
+            self.export(model, vectorizer, os.path.join('stale', name), 'stale')
+        with override_settings(MODERATION_COMPACT_MODELS=True, MODERATION_COMPACT_DIR=os.path.join(self.output.name, 'stale')):
+            with patch('ai_models.moderation.get_moderation_models', return_value=moderation_models) as mock_models:
+                np.testing.assert_array_equal(predict_per_model(self.texts), expected)
+                mock_models.assert_called_once()
+
+# --------------------------------------------------- Cascada de moderación --------------------------------------------------- #
+class KeywordModel:
+    # Clasificador binario de prueba: positivo si aparece alguna de sus palabras
+    classes_ = np.array([0, 1])
+
+    def __init__(self, vectorizer, words):
+        self.columns = [vectorizer.vocabulary_[word] for word in words]
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += X.shape[0]
+        return (X[:, self.columns].sum(axis=1).A1 > 0).astype(int)
+
+class CascadeTest(TestCase):
+    def setUp(self):
+        vectorizer = CountVectorizer().fit(['toxico ofensivo odio limpio'])
+        self.models = [
+            KeywordModel(vectorizer, ['toxico']),
+            KeywordModel(vectorizer, ['ofensivo']),
+            KeywordModel(vectorizer, ['odio']),
+        ]
+        patcher = patch('ai_models.cascade.get_moderation_models', return_value=[(model, vectorizer) for model in self.models])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def full_state(self, item, thresholds, weights):
+        score = sum(weight * sum(word in text.split() for word in ['toxico', 'ofensivo', 'odio']) for weight, text in zip(weights, item))
+        return moderation_state(score, thresholds)
+
+    def test_agrees_with_full_pipeline(self):
+        words = ['toxico', 'ofensivo', 'odio']
+        texts = ['limpio'] + [' '.join(w for w, keep in zip(words, mask) if keep) for mask in np.ndindex(2, 2, 2) if any(mask)]
+
+        for items, thresholds, weights in [
+            ([(text,) for text in texts], REVIEW_THRESHOLDS, REVIEW_WEIGHTS),
+            ([(body, title) for body in texts for title in texts], NEW_THRESHOLDS, NEW_WEIGHTS),
+        ]:
+            scores, evaluations = run_cascade(items, thresholds, weights, use_cache=False, prefilter=False)
+            self.assertEqual([moderation_state(score, thresholds) for score in scores], [self.full_state(item, thresholds, weights) for item in items])
+            self.assertLess(evaluations, len(items) * len(weights) * 3)
+
+    def test_stops_once_the_decision_is_fixed(self):
+        # Tras 'toxico' y no 'ofensivo' la suma queda en [1, 2]: en revisión sea cual sea el tercer modelo
+        self.assertEqual(run_cascade([('toxico',)], REVIEW_THRESHOLDS, REVIEW_WEIGHTS, use_cache=False, prefilter=False), ([1], 2))
+        self.assertEqual(self.models[2].calls, 0)
+
+    def test_prefilter_skips_the_models_for_clean_short_texts(self):
+        scores, evaluations = run_cascade([('Una película preciosa',), ('Menuda basura toxico',)], REVIEW_THRESHOLDS, REVIEW_WEIGHTS, use_cache=False, prefilter=True)
+        self.assertEqual(scores, [0, 1])
+        self.assertEqual(evaluations, 2)
+
+    def test_uses_cached_scores(self):
+        score_cache.clear()
+        score_cache.set_many({text_hash('toxico ofensivo odio'): 3})
+        self.assertEqual(run_cascade([('toxico ofensivo odio',)], REVIEW_THRESHOLDS, REVIEW_WEIGHTS, prefilter=False), ([3], 0))
+        score_cache.clear()
+
+class LexiconAutomatonTest(TestCase):
+    def test_matches_overlapping_terms(self):
+        automaton = LexiconAutomaton(['he', 'she', 'his', 'hers'])
+        self.assertTrue(automaton.matches('ushers'))
+        self.assertTrue(automaton.matches('this'))
+        self.assertFalse(automaton.matches('sh ih'))
+        self.assertFalse(LexiconAutomaton([]).matches('hola'))
+
+    def test_ignores_case_and_accents(self):
+        automaton = LexiconAutomaton(['imbecil'])
+        self.assertTrue(automaton.matches('Eres un IMBÉCIL'))
+        self.assertTrue(LexiconAutomaton(['Imbécil']).matches('imbecil'))
+
+    @override_settings(MODERATION_PREFILTER_MAX_LENGTH=20)
+    def test_only_short_texts_without_terms_are_clean(self):
+        automaton = LexiconAutomaton(['basura'])
+        self.assertTrue(is_obviously_clean('Me ha encantado', automaton))
+        self.assertFalse(is_obviously_clean('Menuda basura', automaton))
+        self.assertFalse(is_obviously_clean('Me ha encantado, de verdad', automaton))
+
+# --------------------------------------------------- Registro de modelos --------------------------------------------------- #
+class ModelRegistryTest(TestCase):
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'happy_detection.joblib')
+        self.write('v1', mtime=1_000_000_000)
+        self.loader = MagicMock(side_effect=lambda: open(self.path).read())
+
+    def write(self, content, mtime):
+        with open(self.path, 'w') as f:
+            f.write(content)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def get(self):
+        return self.registry.get(self.path, [self.path], self.loader)
+
+    def test_loads_once_per_process(self):
+        self.assertEqual([self.get() for _ in range(3)], ['v1'] * 3)
+        self.assertEqual(self.loader.call_count, 1)
+        stats = self.registry.stats()[self.path]
+        self.assertEqual((stats['loads'], stats['hits']), (1, 2))
+
+    def test_reloads_when_the_file_changes(self):
+        self.get()
+        self.write('v2', mtime=2_000_000_000)
+        self.assertEqual(self.get(), 'v2')
+        self.assertEqual(self.registry.stats()[self.path]['loads'], 2)
+
+    @override_settings(MODEL_REGISTRY_VERIFY_HASH=True)
+    def test_hash_avoids_reloading_touched_files(self):
+        self.get()
+        os.utime(self.path, ns=(2_000_000_000, 2_000_000_000))
+        self.assertEqual(self.get(), 'v1')
+        self.assertEqual(self.loader.call_count, 1)
+
+        self.write('v3', mtime=3_000_000_000)
+        self.assertEqual(self.get(), 'v3')
+        self.assertEqual(self.loader.call_count, 2)
+
+class ActorModelCacheTest(TestCase):
+    def setUp(self):
+        self.registry = ModelRegistry(max_bytes=250)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.paths = {}
+        for name in ['will_smith', 'macaulay_culkin', 'emma_stone']:
+            self.paths[name] = os.path.join(self.directory.name, f'{name}_detection.joblib')
+            with open(self.paths[name], 'wb') as f:
+                f.write(b'x' * 100)
+
+    def get(self, name):
+        return self.registry.get(self.paths[name], [self.paths[name]], lambda: name)
+
+    def test_evicts_least_recently_used_within_budget(self):
+        self.get('will_smith')
+        self.get('macaulay_culkin')
+        self.get('will_smith')
+        self.get('emma_stone')
+
+        self.assertTrue(self.registry.is_loaded(self.paths['will_smith']))
+        self.assertFalse(self.registry.is_loaded(self.paths['macaulay_culkin']))
+        self.assertEqual(self.registry.loaded_bytes(), 200)
+        self.assertEqual(self.registry.counters(), {'hits': 1, 'misses': 3, 'evictions': 1})
+
+        self.get('macaulay_culkin')
+        self.assertEqual(self.registry.stats()[self.paths['macaulay_culkin']]['loads'], 2)
+
+    def test_models_in_use_are_not_evicted(self):
+        self.get('will_smith')
+        self.get('macaulay_culkin')
+        # Otro hilo está dentro de get() para will_smith cuando hace falta sitio
+        entry = self.registry.entries[self.paths['will_smith']]
+        with entry.lock:
+            self.get('emma_stone')
+        self.assertEqual(entry.model, 'will_smith')
+        self.assertFalse(self.registry.is_loaded(self.paths['macaulay_culkin']))
+
+    def test_keeps_a_model_larger_than_the_budget(self):
+        registry = ModelRegistry(max_bytes=50)
+        self.assertEqual(registry.get(self.paths['emma_stone'], [self.paths['emma_stone']], lambda: 'emma_stone'), 'emma_stone')
+        self.assertTrue(registry.is_loaded(self.paths['emma_stone']))
+        self.assertFalse(registry.fits(1))
@@ -0,0 +1,51 @@
+import os
+from django.core.management.base import BaseCommand
+from ai_models.job_queue import requeue_failed_jobs, run_worker
+from movies.analysis import run_analysis_job
+from movies.models import PerformanceAnalysisJob
+from ai_models.registry import model_registry, actor_model_registry
+
+class Command(BaseCommand):
+    help = 'Run the pending performance analysis jobs (start several workers to analyse performances in parallel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=3600, help='Seconds after which a running job is requeued')
+        parser.add_argument('--once', action='store_true', help='Process the pending jobs and exit')
+        parser.add_argument('--retry-failed', action='store_true', help='Requeue failed jobs before starting')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['retry_failed']:
+            self.stdout.write(f'Requeued {requeue_failed_jobs(PerformanceAnalysisJob)} failed jobs')
+
+        def step():
+            job = run_analysis_job()
+            if job is None:
+                return False
+            # En el modo por película el mismo token cubre todas las actuaciones analizadas en la pasada
+            analysed = PerformanceAnalysisJob.objects.filter(claimToken=job.claimToken).count()
+            if job.status == PerformanceAnalysisJob.Status.DONE and analysed > 1:
+                self.stdout.write(self.style.SUCCESS(f'Analysed {analysed} performances of {job.performance.movie} in one pass ({job.processedFrames} frames)'))
+            elif job.status == PerformanceAnalysisJob.Status.DONE:
+                self.stdout.write(self.style.SUCCESS(f'Analysed {job.performance} ({job.processedFrames} frames)'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Analysis of {job.performance} failed: {job.error}'))
+            if kwargs['verbosity'] > 1:
+                self.stdout.write(f'  Stages: {job.timings.summary() or "no frames analysed"}')
+                self.write_registry_stats()
+            return True
+
+        run_worker(PerformanceAnalysisJob, step, kwargs['stale_after'], kwargs['once'], kwargs['interval'])
+
+    def write_registry_stats(self):
+        # Los modelos compartidos entre actuaciones solo deberían cargarse una vez por worker
+        for key, stats in list(model_registry.stats().items()) + list(actor_model_registry.stats().items()):
+            self.stdout.write(
+                f'  {os.path.basename(key)}: {stats["loads"]} loads, {stats["hits"]} hits, '
+                f'{stats["evictions"]} evictions, {stats["total_load_seconds"]:.3f} s loading'
+            )
+        counters = actor_model_registry.counters()
+        self.stdout.write(
+            f'  Actor models: {counters["hits"]} hits, {counters["misses"]} misses, {counters["evictions"]} evictions, '
+            f'{actor_model_registry.loaded_bytes() / 2**20:.1f} MiB loaded'
+        )
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+from movies.analysis import emotion_model_paths, movie_frames_dir, yolo_model_files
+from movies.models import Movie
+from movies.pipeline import StageTimings
+from movies.utils import FrameDeduplicator, calculate_frame_statistics, frame_fingerprint, check_files_exist, load_actor_model, load_emotion_runtime, load_joblib, load_yolo_model
+
+COUNTS = ['actor_frame_count', 'happy_frame_count', 'angry_frame_count', 'sadness_frame_count']
+
+class Command(BaseCommand):
+    help = 'Compare near-duplicate frame elimination with full processing (frames kept, count error and speed-up)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movie', type=int, help='Movie id whose frame directory is used')
+        parser.add_argument('--frames-dir', help='Frame directory, e.g. backup_images/movies/<slug>')
+        parser.add_argument('--max-distances', default='0,2,4,8', help='Comma-separated dHash distances to compare')
+        parser.add_argument('--actor-model', help='Actor model (.joblib) to also compare the full analysis')
+        parser.add_argument('--output', help='JSON file where the report is written')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['frames_dir']:
+            frames_dir = kwargs['frames_dir']
+        elif kwargs['movie']:
+            frames_dir = movie_frames_dir(Movie.objects.get(id=kwargs['movie']))
+        else:
+            raise CommandError('Pass --movie or --frames-dir')
+        if not os.path.isdir(frames_dir):
+            raise CommandError(f'{frames_dir} is not a directory')
+
+        frame_files = sorted(os.listdir(frames_dir))
+        distances = [int(distance) for distance in kwargs['max_distances'].split(',') if distance]
+        report = {'frames_dir': frames_dir, 'frames': len(frame_files), 'hash': self.hash_only(frames_dir, frame_files, distances)}
+        if kwargs['actor_model']:
+            report['analysis'] = self.full_analysis(frames_dir, frame_files, distances, kwargs['actor_model'])
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def hash_only(self, frames_dir, frame_files, distances):
+        # Sin modelos: cuántos frames se conservarían y lo que cuesta la huella. Cada frame se reduce a su
+        # huella al leerlo, así que nunca hay más de un frame decodificado en memoria
+        fingerprints = []
+        fingerprint_seconds = 0.0
+        for frame_file in frame_files:
+            image = cv2.imread(os.path.join(frames_dir, frame_file))
+            start = time.perf_counter()
+            fingerprints.append(frame_fingerprint(image) if image is not None else None)
+            fingerprint_seconds += time.perf_counter() - start
+
+        results = {}
+        for distance in distances:
+            deduplicator = FrameDeduplicator(distance)
+            start = time.perf_counter()
+            for fingerprint in fingerprints:
+                deduplicator.is_repeated(fingerprint)
+            elapsed = fingerprint_seconds + time.perf_counter() - start
+            results[distance] = {'kept': deduplicator.kept, 'duplicates': deduplicator.duplicates, 'hash_ms_per_frame': elapsed / max(len(fingerprints), 1) * 1000}
+            self.stdout.write(
+                f'distance {distance}: {deduplicator.kept}/{len(fingerprints)} frames kept '
+                f'({deduplicator.duplicates / max(len(fingerprints), 1):.1%} skipped), {results[distance]["hash_ms_per_frame"]:.3f} ms/frame hashing'
+            )
+        return results
+
+    def full_analysis(self, frames_dir, frame_files, distances, actor_model_path):
+        check_files_exist([actor_model_path] + emotion_model_paths() + yolo_model_files())
+        actor_model = load_actor_model(actor_model_path)
+        happy_model, sad_model, angry_model = [load_joblib(path) for path in emotion_model_paths()]
+        emotion_runtime = load_emotion_runtime(*emotion_model_paths())
+        face_net, face_classes, face_output_layers = load_yolo_model('yolov3-face.cfg', 'yolov3-face.weights', 'face.names')
+
+        def analyse(deduplicator):
+            timings = StageTimings()
+            start = time.perf_counter()
+            statistics = calculate_frame_statistics(frame_files, frames_dir, actor_model, happy_model, sad_model, angry_model, face_net, face_output_layers, emotion_runtime=emotion_runtime, timings=timings, deduplicator=deduplicator)
+            return statistics, time.perf_counter() - start, timings
+
+        reference, reference_seconds, timings = analyse(None)
+        self.stdout.write(f'full: {reference_seconds:.2f} s ({timings.summary()})')
+        self.stdout.write('  ' + ', '.join(f'{name} {reference[name]}' for name in COUNTS))
+
+        results = {'full': {'seconds': reference_seconds, **reference}}
+        for distance in distances:
+            statistics, seconds, timings = analyse(FrameDeduplicator(distance))
+            # Error de cada recuento respecto al total de frames, que es lo que se traduce en tiempo en pantalla
+            errors = {name: (statistics[name] - reference[name]) / max(reference['total_frames'], 1) for name in COUNTS}
+            results[distance] = {'seconds': seconds, 'speedup': reference_seconds / seconds if seconds else 0, 'errors': errors, **statistics}
+            self.stdout.write(
+                f'distance {distance}: {seconds:.2f} s, x{results[distance]["speedup"]:.2f} faster; '
+                + ', '.join(f'{name} {statistics[name]} ({errors[name]:+.2%})' for name in COUNTS)
+            )
+        return results
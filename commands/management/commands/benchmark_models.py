@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CHILD_SCRIPT = '''
+import json, time, psutil
+process = psutil.Process()
+start = time.perf_counter()
+import django
+django.setup()
+setup_time = time.perf_counter() - start
+setup_rss = process.memory_info().rss
+from django.apps import apps
+start = time.perf_counter()
+apps.get_app_config('ai_models').warm_up()
+warm_up_time = time.perf_counter() - start
+warm_up_rss = process.memory_info().rss
+print(json.dumps({
+    'setup_time': setup_time,
+    'setup_rss': setup_rss,
+    'warm_up_time': warm_up_time,
+    'warm_up_rss': warm_up_rss,
+}))
+'''
+
+class Command(BaseCommand):
+    help = 'Measure startup time and memory of the moderation models (lazy vs eager, with and without mmap)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Number of fresh processes per configuration')
+
+    def run_child(self, mmap_mode):
+        env = os.environ.copy()
+        env['DJANGO_SETTINGS_MODULE'] = os.environ.get('DJANGO_SETTINGS_MODULE', 'moviesphere.settings')
+        env['AI_MODELS_MMAP_MODE'] = mmap_mode
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **kwargs):
+        runs = kwargs['runs']
+
+        for label, mmap_mode in [('mmap', 'r'), ('no mmap', '')]:
+            results = [self.run_child(mmap_mode) for _ in range(runs)]
+            setup_time = sum(r['setup_time'] for r in results) / runs
+            warm_up_time = sum(r['warm_up_time'] for r in results) / runs
+            setup_rss = sum(r['setup_rss'] for r in results) / runs / 2**20
+            warm_up_rss = sum(r['warm_up_rss'] for r in results) / runs / 2**20
+
+            self.stdout.write(self.style.SUCCESS(f'[{label}] {runs} runs'))
+            self.stdout.write(f'  Lazy startup:  {setup_time:.3f} s, RSS {setup_rss:.1f} MiB')
+            self.stdout.write(f'  Warm-up:       {warm_up_time:.3f} s, RSS {warm_up_rss:.1f} MiB')
+            self.stdout.write(f'  Eager startup: {setup_time + warm_up_time:.3f} s, RSS {warm_up_rss:.1f} MiB')
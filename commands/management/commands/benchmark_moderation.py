@@ -0,0 +1,138 @@
+import json
+import platform
+import random
+import time
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from ai_models.cache import LRUCache, text_hash
+from ai_models.moderation import predict_texts
+import numpy as np
+
+# Métricas comparadas con la línea base: (clave, True si más alto es mejor)
+COMPARED_METRICS = [('p50_ms', False), ('p95_ms', False), ('texts_per_sec', True)]
+
+def summarize(latencies, texts):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'calls': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'texts_per_sec': texts / (latencies.sum() / 1000),
+    }
+
+class Command(BaseCommand):
+    help = 'Benchmark moderation inference (single, batched and cached calls) and compare it with a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Text file with one text per line')
+        parser.add_argument('--sample', action='store_true', help='Sample the corpus from the reviews and news in the database')
+        parser.add_argument('--size', type=int, default=500, help='Number of texts in the corpus')
+        parser.add_argument('--batch-sizes', default='8,32,128', help='Comma-separated batch sizes to sweep')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON file where the results are written')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.1, help='Relative change reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def build_corpus(self, kwargs, rng):
+        size = kwargs['size']
+        if kwargs['corpus']:
+            with open(kwargs['corpus'], encoding='utf-8') as f:
+                texts = [line.strip() for line in f if line.strip()]
+            return 'file', texts[:size]
+
+        if kwargs['sample']:
+            Review = apps.get_model('movies', 'Review')
+            New = apps.get_model('news', 'New')
+            texts = list(Review.objects.values_list('body', flat=True)[:size])
+            for body, title in New.objects.values_list('body', 'title')[:size]:
+                texts += [body, title]
+            if not texts:
+                raise CommandError('There are no reviews or news to sample from')
+            rng.shuffle(texts)
+            return 'sample', texts[:size]
+
+        # Corpus sintético con palabras del vocabulario y longitudes de reseña corta a noticia
+        vocabulary = sorted(apps.get_app_config('ai_models').toxic_vectorizer.vocabulary_)
+        lengths = [rng.choice([5, 10, 20, 40, 80, 160]) for _ in range(size)]
+        return 'synthetic', [' '.join(rng.choices(vocabulary, k=length)) for length in lengths]
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs['seed'])
+        batch_sizes = [int(size) for size in kwargs['batch_sizes'].split(',') if size]
+        source, texts = self.build_corpus(kwargs, rng)
+        config = apps.get_app_config('ai_models')
+
+        predict_texts(texts[:1])
+        results = {}
+
+        # Llamadas individuales, como en la publicación de una reseña
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            predict_texts([text])
+            latencies.append(time.perf_counter() - start)
+        results['single'] = summarize(latencies, len(texts))
+
+        for batch_size in batch_sizes:
+            latencies = []
+            for start_index in range(0, len(texts), batch_size):
+                start = time.perf_counter()
+                predict_texts(texts[start_index:start_index + batch_size])
+                latencies.append(time.perf_counter() - start)
+            results[f'batch_{batch_size}'] = summarize(latencies, len(texts))
+
+        # Solo se mide el nivel en memoria, ya caliente: pasar por score_texts guardaría el corpus en CachedHateScore
+        memory = LRUCache(len(texts))
+        memory.set_many({(text_hash(text), config.model_version): score for text, score in zip(texts, predict_texts(texts))})
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            memory.get_many([(text_hash(text), config.model_version)])
+            latencies.append(time.perf_counter() - start)
+        results['cached'] = summarize(latencies, len(texts))
+
+        report = {
+            'model_version': config.model_version,
+            'corpus': {'source': source, 'texts': len(texts), 'mean_chars': sum(map(len, texts)) / len(texts)},
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:>10}: p50 {result["p50_ms"]:8.3f} ms  p95 {result["p95_ms"]:8.3f} ms  '
+                f'p99 {result["p99_ms"]:8.3f} ms  {result["texts_per_sec"]:10.1f} texts/s'
+            )
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if kwargs['baseline']:
+            regressions = self.compare(report, kwargs['baseline'], kwargs['tolerance'])
+            if regressions and kwargs['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} metrics regressed: {", ".join(regressions)}')
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        if baseline.get('model_version') != report['model_version']:
+            self.stdout.write(self.style.WARNING('The baseline was measured with other model artifacts'))
+
+        regressions = []
+        for name, result in report['results'].items():
+            if name not in baseline['results']:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS:
+                before, after = baseline['results'][name][metric], result[metric]
+                change = (after - before) / before if before else 0
+                regressed = change < -tolerance if higher_is_better else change > tolerance
+                if regressed:
+                    regressions.append(f'{name}.{metric}')
+                line = f'  {name}.{metric}: {before:.3f} -> {after:.3f} ({change:+.1%})'
+                self.stdout.write(self.style.ERROR(line) if regressed else line)
+        return regressions
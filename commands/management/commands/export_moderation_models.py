@@ -0,0 +1,50 @@
+import os
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ai_models.compact import MODEL_NAMES, CompactModel, export_model, predict_compact
+
+SAMPLE_TEXTS = [
+    'No me ha gustado la peli',
+    'La entrega de premios me ha parecido injusta. ¡Debería haber ganado Will Smith!',
+    'basura de peli, espantosa, lo peor',
+    'Una película preciosa con una banda sonora increíble y unos actores que están a la altura',
+]
+
+class Command(BaseCommand):
+    help = 'Export the moderation models to the compact linear format and compare its latency with sklearn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.MODERATION_COMPACT_DIR, help='Directory where the compact models are written')
+        parser.add_argument('--calls', type=int, default=2000, help='Single-text calls per benchmark (0 skips it)')
+
+    def handle(self, *args, **kwargs):
+        config = apps.get_app_config('ai_models')
+        moderation_models = [(getattr(config, f'{name}_model'), getattr(config, f'{name}_vectorizer')) for name in MODEL_NAMES]
+
+        for name, (model, vectorizer) in zip(MODEL_NAMES, moderation_models):
+            try:
+                export_model(model, vectorizer, os.path.join(kwargs['output'], name), config.model_version)
+            except ValueError as e:
+                raise CommandError(f'{name}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Compact models exported to {kwargs["output"]} (version {config.model_version})'))
+
+        calls = kwargs['calls']
+        if calls <= 0:
+            return
+
+        compact_models = [CompactModel(os.path.join(kwargs['output'], name)) for name in MODEL_NAMES]
+
+        # La referencia es el camino original de sklearn, sin la tokenización compartida de transform_texts
+        def sklearn_predict(texts):
+            return [model.predict(vectorizer.transform(texts)) for model, vectorizer in moderation_models]
+
+        # Cada llamada puntúa un único texto, el caso de una reseña al publicarse
+        for label, predict in [('sklearn', sklearn_predict), ('compact', lambda texts: predict_compact(compact_models, texts))]:
+            predict(SAMPLE_TEXTS[:1])
+            start = time.perf_counter()
+            for i in range(calls):
+                predict([SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'  {label}: {elapsed / calls * 1e6:.1f} µs per call')
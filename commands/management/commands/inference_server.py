@@ -0,0 +1,34 @@
+import threading
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ai_models.moderation import predict_per_model
+from ai_models.server import InferenceServer, MicroBatcher
+
+class Command(BaseCommand):
+    help = 'Serve moderation predictions to every web worker over a Unix socket, batching concurrent requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.MODERATION_SOCKET, help='Path of the Unix socket (defaults to MODERATION_SOCKET)')
+        parser.add_argument('--window-ms', type=float, default=5.0, help='Time window used to coalesce concurrent requests')
+        parser.add_argument('--max-batch', type=int, default=256, help='Maximum number of texts per batch')
+
+    def handle(self, *args, **kwargs):
+        socket_path = kwargs['socket']
+        if not socket_path:
+            raise CommandError('A socket path is required (--socket or MODERATION_SOCKET)')
+
+        apps.get_app_config('ai_models').warm_up()
+
+        batcher = MicroBatcher(lambda texts: predict_per_model(texts).tolist(), kwargs['window_ms'] / 1000, kwargs['max_batch'])
+        threading.Thread(target=batcher.run, daemon=True).start()
+
+        server = InferenceServer(socket_path, batcher)
+        self.stdout.write(self.style.SUCCESS(f'Inference server listening on {socket_path}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            batcher.stop()
+            server.server_close()
@@ -0,0 +1,64 @@
+import time
+from collections import Counter
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from ai_models.cascade import run_cascade
+from ai_models.moderation import predict_per_model, moderation_state, REVIEW_THRESHOLDS, NEW_THRESHOLDS, REVIEW_WEIGHTS, NEW_WEIGHTS
+
+TARGETS = {
+    'reviews': ('movies', 'Review', ['body'], REVIEW_THRESHOLDS, REVIEW_WEIGHTS),
+    'news': ('news', 'New', ['body', 'title'], NEW_THRESHOLDS, NEW_WEIGHTS),
+}
+
+class Command(BaseCommand):
+    help = 'Measure how often the moderation cascade (with and without the lexicon prefilter) agrees with the full pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='Text file with one review per line (defaults to the reviews and news in the database)')
+        parser.add_argument('--limit', type=int, default=5000, help='Maximum number of items per target')
+
+    def load_items(self, corpus, limit):
+        if corpus:
+            with open(corpus, encoding='utf-8') as f:
+                items = [(line.strip(),) for line in f if line.strip()][:limit]
+            return {'reviews': items}
+
+        loaded = {}
+        for target, (app_label, model_name, text_fields, thresholds, weights) in TARGETS.items():
+            Model = apps.get_model(app_label, model_name)
+            loaded[target] = list(Model.objects.order_by('pk').values_list(*text_fields)[:limit])
+        return loaded
+
+    def handle(self, *args, **kwargs):
+        for target, items in self.load_items(kwargs['corpus'], kwargs['limit']).items():
+            if not items:
+                continue
+            thresholds, weights = TARGETS[target][3:]
+
+            # Referencia: los tres modelos sobre todos los textos, sin caché
+            predict_per_model([items[0][0]])
+            start = time.perf_counter()
+            predictions = predict_per_model([text for item in items for text in item])
+            scores = iter(predictions.sum(axis=1))
+            full_states = [moderation_state(sum(weight * next(scores) for weight in weights), thresholds) for item in items]
+            full_time = time.perf_counter() - start
+            full_evaluations = predictions.size
+
+            self.stdout.write(self.style.SUCCESS(f'{target}: {len(items)} items, full pipeline {full_time:.3f} s, {full_evaluations} model evaluations'))
+            for label, prefilter in [('cascade', False), ('cascade + prefilter', True)]:
+                start = time.perf_counter()
+                cascade_scores, evaluations = run_cascade(items, thresholds, weights, use_cache=False, prefilter=prefilter)
+                elapsed = time.perf_counter() - start
+
+                disagreements = Counter(
+                    f'{full_state} -> {moderation_state(score, thresholds)}'
+                    for full_state, score in zip(full_states, cascade_scores)
+                    if full_state != moderation_state(score, thresholds)
+                )
+                agreement = 1 - sum(disagreements.values()) / len(items)
+                self.stdout.write(
+                    f'  {label}: agreement {agreement:.2%}, {elapsed:.3f} s, '
+                    f'{evaluations} model evaluations ({evaluations / full_evaluations:.0%})'
+                )
+                for transition, count in sorted(disagreements.items()):
+                    self.stdout.write(f'    {transition}: {count}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from ai_models.job_queue import requeue_failed_jobs, run_worker
+from ai_models.jobs import run_moderation_jobs
+from ai_models.models import ModerationJob
+
+class Command(BaseCommand):
+    help = 'Score deferred reviews and news from the moderation job table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Maximum number of jobs scored together')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help='Seconds after which a running job is requeued')
+        parser.add_argument('--once', action='store_true', help='Process the pending jobs and exit')
+        parser.add_argument('--retry-failed', action='store_true', help='Requeue failed jobs before starting')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['retry_failed']:
+            self.stdout.write(f'Requeued {requeue_failed_jobs(ModerationJob)} failed jobs')
+
+        def step():
+            processed = run_moderation_jobs(kwargs['batch_size'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Moderated {processed} items'))
+            return processed
+
+        run_worker(ModerationJob, step, kwargs['stale_after'], kwargs['once'], kwargs['interval'])
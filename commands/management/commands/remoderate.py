@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ai_models.moderation import predict_texts, new_hate_score, moderation_state, REVIEW_THRESHOLDS, NEW_THRESHOLDS
+
+MODERATED_STATES = ['PUBLISHED', 'IN_REVIEW', 'FORBIDDEN']
+
+REPORT_HEADER = ['target', 'pk', 'old_score', 'new_score', 'old_state', 'new_state']
+
+TARGETS = {
+    'reviews': ('movies', 'Review', ['body'], REVIEW_THRESHOLDS),
+    'news': ('news', 'New', ['body', 'title'], NEW_THRESHOLDS),
+}
+
+def init_worker():
+    import django
+    if not apps.ready:
+        django.setup()
+
+def score_reviews(rows):
+    return predict_texts(list(rows))
+
+def score_news(rows):
+    scores = iter(predict_texts([text for body, title in rows for text in (body, title)]))
+    return [new_hate_score(body_score, title_score) for body_score, title_score in zip(scores, scores)]
+
+SCORERS = {'reviews': score_reviews, 'news': score_news}
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class Command(BaseCommand):
+    help = 'Rescore every review and news item with the current moderation models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['all'] + list(TARGETS), default='all')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows streamed and scored per chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Scoring processes (0 scores in this process)')
+        parser.add_argument('--checkpoint', default='remoderation_checkpoint.json', help='File used to resume an interrupted run')
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Report the state changes without writing anything')
+        parser.add_argument('--report', help='CSV file where every row that would change state is appended')
+
+    def load_checkpoint(self, path, restart):
+        if restart or not os.path.exists(path):
+            return {target: {'last_pk': 0, 'rescored': 0, 'changed': 0, 'transitions': {}, 'report_size': 0} for target in TARGETS}
+        with open(path) as f:
+            checkpoint = json.load(f)
+
+        # El checkpoint se escribe antes de guardar las puntuaciones del chunk: si el proceso murió
+        # entre medias, el chunk se vuelve a puntuar desde el estado anterior sin contarlo dos veces
+        for target, progress in checkpoint.items():
+            applied = progress.pop('applied', [])
+            previous = progress.pop('previous', None)
+            if previous is not None and not self.is_applied(target, applied):
+                checkpoint[target] = previous
+
+        # Las filas del informe de un chunk que no llegó a completarse se descartan
+        report_sizes = [progress['report_size'] for progress in checkpoint.values() if 'report_size' in progress]
+        if self.report_path and report_sizes and os.path.exists(self.report_path):
+            with open(self.report_path, 'r+') as f:
+                f.truncate(max(report_sizes))
+        return checkpoint
+
+    def is_applied(self, target, applied):
+        app_label, model_name, text_fields, thresholds = TARGETS[target]
+        scores = dict(apps.get_model(app_label, model_name).objects.filter(pk__in=[pk for pk, score in applied]).values_list('pk', 'hateScore'))
+        return all(scores.get(pk, score) == score for pk, score in applied)
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **kwargs):
+        checkpoint_path = kwargs['checkpoint']
+        dry_run = kwargs['dry_run']
+        self.report_path = kwargs['report']
+        checkpoint = self.load_checkpoint(checkpoint_path, kwargs['restart'] or dry_run)
+        targets = list(TARGETS) if kwargs['target'] == 'all' else [kwargs['target']]
+
+        if kwargs['workers'] > 0:
+            # Los procesos hijos solo puntúan textos, nunca tocan la base de datos
+            executor = ProcessPoolExecutor(max_workers=kwargs['workers'], initializer=init_worker)
+            max_in_flight = kwargs['workers'] * 2
+        else:
+            executor = InlineExecutor()
+            max_in_flight = 1
+
+        with executor:
+            for target in targets:
+                self.remoderate(target, executor, max_in_flight, kwargs['chunk_size'], checkpoint, checkpoint_path, dry_run)
+
+        for target in targets:
+            progress = checkpoint[target]
+            self.stdout.write(self.style.SUCCESS(f'{target}: {progress["rescored"]} rescored, {progress["changed"]} hate scores changed'))
+            for transition, count in sorted(progress['transitions'].items()):
+                self.stdout.write(f'  {transition}: {count}')
+
+        if not dry_run and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def remoderate(self, target, executor, max_in_flight, chunk_size, checkpoint, checkpoint_path, dry_run):
+        app_label, model_name, text_fields, thresholds = TARGETS[target]
+        Model = apps.get_model(app_label, model_name)
+        progress = checkpoint[target]
+
+        rows = (
+            Model.objects.filter(pk__gt=progress['last_pk'], state__in=MODERATED_STATES)
+            .order_by('pk')
+            .values_list('pk', 'state', 'hateScore', *text_fields)
+            .iterator(chunk_size=chunk_size)
+        )
+
+        # Los chunks se puntúan en paralelo pero se aplican en orden para que el checkpoint sea monótono
+        in_flight = deque()
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if chunk:
+                texts = [row[3] if len(text_fields) == 1 else tuple(row[3:]) for row in chunk]
+                in_flight.append((chunk, executor.submit(SCORERS[target], texts)))
+            if in_flight and (len(in_flight) >= max_in_flight or not chunk):
+                done_chunk, future = in_flight.popleft()
+                progress = self.apply_scores(target, Model, done_chunk, future.result(), thresholds, progress, checkpoint, checkpoint_path, dry_run)
+            if not chunk and not in_flight:
+                break
+
+    def apply_scores(self, target, Model, chunk, scores, thresholds, progress, checkpoint, checkpoint_path, dry_run):
+        changed = []
+        state_changes = []
+        transitions = Counter(progress['transitions'])
+
+        for (pk, state, hate_score, *texts), score in zip(chunk, scores):
+            score = int(score)
+            if score != hate_score:
+                changed.append(Model(pk=pk, hateScore=score))
+            new_state = moderation_state(score, thresholds)
+            if new_state != state:
+                transitions[f'{state} -> {new_state}'] += 1
+                state_changes.append([target, pk, hate_score, score, state, new_state])
+
+        report_size = progress.get('report_size', 0)
+        if state_changes and self.report_path:
+            with open(self.report_path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(REPORT_HEADER)
+                writer.writerows(state_changes)
+                report_size = f.tell()
+
+        previous = progress
+        progress = {
+            'last_pk': chunk[-1][0],
+            'rescored': progress['rescored'] + len(chunk),
+            'changed': progress['changed'] + len(changed),
+            'transitions': dict(transitions),
+            'report_size': report_size,
+        }
+        checkpoint[target] = progress
+
+        if not dry_run:
+            # Primero el checkpoint con lo que se va a escribir y después las puntuaciones
+            self.save_checkpoint(checkpoint_path, {
+                **checkpoint,
+                target: {**progress, 'previous': previous, 'applied': [[instance.pk, instance.hateScore] for instance in changed]},
+            })
+            with transaction.atomic():
+                Model.objects.bulk_update(changed, ['hateScore'], batch_size=500)
+        return progress
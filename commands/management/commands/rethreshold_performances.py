@@ -0,0 +1,63 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.signals import post_save
+from movies.analysis import actor_model_path, movie_frames, movie_frames_dir
+from movies.frame_ledger import count_frame_flags
+from movies.models import Performance
+from movies.score_store import FRAME_THRESHOLDS, FaceScoreStore, score_store_path
+from movies.signals import performance_post_save
+from movies.utils import update_performance_instance
+
+class Command(BaseCommand):
+    help = 'Recompute screen time and emotion analyses from the stored face scores with new thresholds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movie', type=int, help='Only the performances of this movie id')
+        parser.add_argument('--actor', type=float, default=FRAME_THRESHOLDS['actor'])
+        parser.add_argument('--happy', type=float, default=FRAME_THRESHOLDS['happy'])
+        parser.add_argument('--angry', type=float, default=FRAME_THRESHOLDS['angry'])
+        parser.add_argument('--sadness', type=float, default=FRAME_THRESHOLDS['sadness'])
+        parser.add_argument('--dry-run', action='store_true', help='Print the new statistics without saving them')
+
+    def handle(self, *args, **kwargs):
+        thresholds = {name: kwargs[name] for name in FRAME_THRESHOLDS}
+        performances = Performance.objects.select_related('actor', 'movie')
+        if kwargs['movie']:
+            performances = performances.filter(movie_id=kwargs['movie'])
+
+        updated = 0
+        # Guardar la actuación no debe encolar un análisis aunque el nuevo tiempo en pantalla sea 0
+        post_save.disconnect(performance_post_save, sender=Performance)
+        try:
+            for performance in performances:
+                path = score_store_path(movie_frames_dir(performance.movie), actor_model_path(performance.actor))
+                if not os.path.exists(path):
+                    continue
+
+                start = time.perf_counter()
+                store = FaceScoreStore(path)
+                if thresholds['actor'] < store.floor:
+                    raise CommandError(f'The scores of {performance} only keep faces above {store.floor}; the actor threshold cannot be lower')
+                # Si al almacén le faltan frames de la película, el recuento daría un tiempo en pantalla falso
+                frames_dir, frame_files, video_path = movie_frames(performance.movie)
+                missing = set(frame_files or []) - store.stored_frames()
+                if missing:
+                    self.stdout.write(self.style.WARNING(f'{performance}: skipped, the stored scores miss {len(missing)} of {len(frame_files)} frames; run the analysis again'))
+                    continue
+                statistics = {'total_frames': len(store.names), **count_frame_flags(store.flags(thresholds))}
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f'{performance}: {statistics["actor_frame_count"]}/{statistics["total_frames"]} frames, '
+                    f'{statistics["happy_frame_count"]} happy, {statistics["angry_frame_count"]} angry, '
+                    f'{statistics["sadness_frame_count"]} sad ({elapsed * 1000:.1f} ms)'
+                )
+                if not kwargs['dry_run']:
+                    update_performance_instance(performance, statistics)
+                    updated += 1
+        finally:
+            post_save.connect(performance_post_save, sender=Performance)
+
+        if not kwargs['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Updated {updated} performances'))
@@ -1,3 +1,244 @@
 from django.test import TestCase
+from django.core.management import call_command, CommandError
+from django.contrib.auth.models import User
+from unittest.mock import patch
+from djmoney.money import Money
+from ai_models.models import CachedHateScore
+from movies.analysis import actor_model_path, movie_frames_dir
+from movies.models import Movie, Review, Actor, Performance, Emotion, Analysis, PerformanceAnalysisJob
+from movies.score_store import FaceScoreStore, score_store_path
+from news.models import New, Category
+from io import StringIO
+from datetime import date
+import numpy as np
+import cv2
+import csv
+import shutil
+import tempfile
+import json
+import os
 
-# Create your tests here.
+# --------------------------------------------------- Remoderación masiva --------------------------------------------------- #
+class RemoderateCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.movie = Movie.objects.create(
+            title="Test Movie",
+            director="Director 1",
+            releaseYear=2023,
+            image="http://example.com/movie_image.jpg",
+            duration=120,
+            country="Country 1",
+            budget=Money(100000, 'USD'),
+            revenue=Money(150000, 'USD'),
+        )
+        self.reviews = [
+            Review.objects.create(movie=self.movie, user=self.user, body=f'Review {i}', rating=3, state=Review.State.PUBLISHED)
+            for i in range(5)
+        ]
+        self.draft = Review.objects.create(movie=self.movie, user=self.user, body='Draft', rating=3, state=Review.State.IN_DRAFT)
+        self.new = New.objects.create(
+            title='Title', body='Body', photo='test.jpg', author=self.user,
+            category=Category.objects.create(name='Tech'), state=New.State.PUBLISHED
+        )
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+
+    def tearDown(self):
+        Movie.objects.all().delete()
+
+    def fake_predict_texts(self, texts):
+        return [3 if text in ('Review 1', 'Body') else 0 for text in texts]
+
+    def test_remoderate_updates_scores_and_reports(self):
+        report = os.path.join(self.directory, 'report.csv')
+        out = StringIO()
+        with patch('commands.management.commands.remoderate.predict_texts', side_effect=self.fake_predict_texts):
+            call_command('remoderate', workers=0, chunk_size=2, checkpoint=self.checkpoint, report=report, stdout=out)
+
+        self.assertEqual(Review.objects.get(body='Review 1').hateScore, 3)
+        self.assertEqual(Review.objects.get(body='Review 1').state, Review.State.PUBLISHED)
+        self.assertEqual(Review.objects.get(body='Review 0').hateScore, 0)
+        self.assertEqual(New.objects.get(title='Title').hateScore, 6)
+        self.assertIn('reviews: 5 rescored, 1 hate scores changed', out.getvalue())
+        self.assertIn('PUBLISHED -> FORBIDDEN: 1', out.getvalue())
+        with open(report) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['target', 'pk', 'old_score', 'new_score', 'old_state', 'new_state'])
+        self.assertEqual(len(rows), 3)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_writes_nothing(self):
+        with patch('commands.management.commands.remoderate.predict_texts', side_effect=self.fake_predict_texts):
+            call_command('remoderate', workers=0, checkpoint=self.checkpoint, dry_run=True, stdout=StringIO())
+        self.assertEqual(Review.objects.get(body='Review 1').hateScore, 0)
+
+    def test_resume_from_checkpoint(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({
+                'reviews': {'last_pk': self.reviews[2].pk, 'rescored': 3, 'changed': 0, 'transitions': {}},
+                'news': {'last_pk': self.new.pk, 'rescored': 1, 'changed': 0, 'transitions': {}},
+            }, f)
+
+        with patch('commands.management.commands.remoderate.predict_texts', side_effect=lambda texts: [1] * len(texts)) as mock_predict_texts:
+            call_command('remoderate', workers=0, checkpoint=self.checkpoint, stdout=StringIO())
+
+        mock_predict_texts.assert_called_once_with(['Review 3', 'Review 4'])
+        self.assertEqual(Review.objects.get(body='Review 0').hateScore, 0)
+        self.assertEqual(Review.objects.get(body='Review 4').hateScore, 1)
+
+    def test_chunk_interrupted_before_its_update_is_counted_once(self):
+        report = os.path.join(self.directory, 'report.csv')
+        out = StringIO()
+
+        # El proceso muere tras escribir el checkpoint del primer chunk y antes de guardar sus puntuaciones
+        with patch('commands.management.commands.remoderate.predict_texts', side_effect=self.fake_predict_texts):
+            with patch.object(Review.objects, 'bulk_update', side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command('remoderate', workers=0, chunk_size=2, checkpoint=self.checkpoint, report=report, stdout=StringIO())
+            self.assertEqual(Review.objects.get(body='Review 1').hateScore, 0)
+            call_command('remoderate', workers=0, chunk_size=2, checkpoint=self.checkpoint, report=report, stdout=out)
+
+        self.assertEqual(Review.objects.get(body='Review 1').hateScore, 3)
+        self.assertIn('reviews: 5 rescored, 1 hate scores changed', out.getvalue())
+        self.assertIn('PUBLISHED -> FORBIDDEN: 1', out.getvalue())
+        with open(report) as f:
+            self.assertEqual(len(list(csv.reader(f))), 3)
+
+# --------------------------------------------------- Benchmark de moderación --------------------------------------------------- #
+@patch('commands.management.commands.benchmark_moderation.predict_texts', side_effect=lambda texts: [0] * len(texts))
+class BenchmarkModerationCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.corpus = os.path.join(self.directory, 'corpus.txt')
+        with open(self.corpus, 'w') as f:
+            f.write('\n'.join(f'Reseña de prueba {i}' for i in range(20)))
+        self.output = os.path.join(self.directory, 'results.json')
+
+    def test_writes_percentiles_for_every_mode(self, mock_predict_texts):
+        call_command('benchmark_moderation', corpus=self.corpus, batch_sizes='4,16', output=self.output, stdout=StringIO())
+
+        with open(self.output) as f:
+            report = json.load(f)
+        self.assertEqual(report['corpus']['texts'], 20)
+        self.assertEqual(list(report['results']), ['single', 'batch_4', 'batch_16', 'cached'])
+        self.assertEqual(report['results']['batch_4']['calls'], 5)
+        for result in report['results'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # El corpus del benchmark no se guarda en la caché persistente
+        self.assertFalse(CachedHateScore.objects.exists())
+
+    def test_fails_on_regression_against_baseline(self, mock_predict_texts):
+        call_command('benchmark_moderation', corpus=self.corpus, batch_sizes='4', output=self.output, stdout=StringIO())
+        with open(self.output) as f:
+            baseline = json.load(f)
+        for result in baseline['results'].values():
+            result['p50_ms'] /= 100
+        with open(self.output, 'w') as f:
+            json.dump(baseline, f)
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark_moderation', corpus=self.corpus, batch_sizes='4', baseline=self.output, fail_on_regression=True, stdout=StringIO())
+
+# --------------------------------------------------- Umbrales del análisis de actuaciones --------------------------------------------------- #
+class RethresholdPerformancesCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings_override = self.settings(FACE_SCORE_DIR=self.directory)
+        self.settings_override.enable()
+        self.movie = Movie.objects.create(
+            title="Test Movie",
+            director="Director 1",
+            releaseYear=2023,
+            image="http://example.com/movie_image.jpg",
+            duration=120,
+            country="Country 1",
+            budget=Money(100000, 'USD'),
+            revenue=Money(150000, 'USD'),
+        )
+        self.actor = Actor.objects.create(
+            name="Will Smith", gender="Male", birthday=date(1990, 1, 1), nationality="Test Nationality",
+            principalImage="path/to/image.jpg", height=180.0, weight=75.0, hair_color="Brown", eye_color="Blue"
+        )
+        self.performance = Performance.objects.create(actor=self.actor, movie=self.movie, screenTime=10)
+        for name in ['Felicidad', 'Tristeza', 'Enfado']:
+            Emotion.objects.get_or_create(name=name, defaults={'modelName': name})
+
+        # Cuatro frames: dos rostros en el primero, ninguno en el segundo y uno en los dos últimos
+        store = FaceScoreStore(score_store_path(movie_frames_dir(self.movie), actor_model_path(self.actor)), 'v1', 0.5)
+        store.record(
+            ['frame0.jpg', 'frame1.jpg', 'frame2.jpg', 'frame3.jpg'],
+            np.array([0, 0, 2, 3]),
+            np.array([0.6, 0.9, 0.8, 0.58]),
+            np.array([0.8, 0.2, 0.9, 0.0]),
+            np.zeros(4),
+            np.zeros(4),
+        )
+        store.save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        Movie.objects.all().delete()
+
+    def test_recomputes_screen_time_with_new_thresholds(self):
+        call_command('rethreshold_performances', stdout=StringIO())
+        self.performance.refresh_from_db()
+        self.assertEqual(float(self.performance.screenTime), 3600)
+        self.assertEqual(float(Analysis.objects.get(performance=self.performance, emotion__name='Felicidad').result), 1800)
+
+        # Con un umbral de actor más bajo cuenta el primer rostro del primer frame, que sí está feliz
+        call_command('rethreshold_performances', actor=0.55, movie=self.movie.id, stdout=StringIO())
+        self.performance.refresh_from_db()
+        self.assertEqual(float(self.performance.screenTime), 5400)
+        self.assertEqual(float(Analysis.objects.get(performance=self.performance, emotion__name='Felicidad').result), 3600)
+        self.assertFalse(PerformanceAnalysisJob.objects.exists())
+
+    def test_dry_run_and_thresholds_below_the_stored_floor(self):
+        output = StringIO()
+        call_command('rethreshold_performances', dry_run=True, stdout=output)
+        self.performance.refresh_from_db()
+        self.assertEqual(float(self.performance.screenTime), 10)
+        self.assertIn('2/4 frames, 1 happy', output.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('rethreshold_performances', actor=0.4, stdout=StringIO())
+
+    def test_skips_stores_that_miss_frames_of_the_movie(self):
+        frames_dir = movie_frames_dir(self.movie)
+        os.makedirs(frames_dir, exist_ok=True)
+        for index in range(5):
+            open(os.path.join(frames_dir, f'frame{index}.jpg'), 'w').close()
+
+        output = StringIO()
+        call_command('rethreshold_performances', stdout=output)
+        self.performance.refresh_from_db()
+        self.assertEqual(float(self.performance.screenTime), 10)
+        self.assertIn('miss 1 of 5 frames', output.getvalue())
+
+# --------------------------------------------------- Eliminación de frames duplicados --------------------------------------------------- #
+class BenchmarkFrameDedupCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        rng = np.random.default_rng(0)
+        scenes = [rng.integers(0, 255, (72, 128, 3), dtype=np.uint8) for _ in range(2)]
+        # Tres frames de la primera escena y dos de la segunda
+        for index, scene in enumerate([scenes[0]] * 3 + [scenes[1]] * 2):
+            cv2.imwrite(os.path.join(self.directory, f'frame{index:04d}.png'), scene)
+        self.output = os.path.join(self.directory, 'report.json')
+
+    def test_reports_the_frames_kept_per_distance(self):
+        call_command('benchmark_frame_dedup', frames_dir=self.directory, max_distances='0,4', output=self.output, stdout=StringIO())
+        with open(self.output) as f:
+            report = json.load(f)
+        self.assertEqual(report['frames'], 5)
+        self.assertEqual(report['hash']['4']['kept'], 2)
+        self.assertEqual(report['hash']['4']['duplicates'], 3)
+        self.assertNotIn('analysis', report)
+
+    def test_requires_a_frame_source(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_frame_dedup', stdout=StringIO())
@@ -0,0 +1,232 @@
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+from ai_models import job_queue
+from ai_models.job_queue import enqueue_job
+from ai_models.registry import actor_model_registry
+from .face_cache import FaceDetectionCache, detector_version, face_cache_path, files_version
+from .pipeline import StageTimings
+from .frame_ledger import FrameLedger, frame_ledger_path
+from .score_store import FRAME_THRESHOLDS, FaceScoreStore, score_store_path
+from .utils import (load_joblib, load_actor_model, load_yolo_model, calculate_frame_statistics, calculate_movie_statistics, update_performance_instance, check_files_exist, load_emotion_runtime, video_frame_names, FrameDeduplicator)
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se guarda el progreso de un trabajo en la base de datos
+PROGRESS_INTERVAL = 2.0
+
+VIDEO_EXTENSIONS = ['mp4', 'mkv', 'avi', 'mov', 'webm']
+
+def actor_model_path(actor):
+    resources_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources')
+    actor_model_filename = f"{slugify(actor.name.replace(' ', '_')).lower()}_detection.joblib"
+    return os.path.join(resources_path, actor_model_filename)
+
+def movie_frames_dir(movie):
+    return os.path.join(settings.MEDIA_ROOT, f"images/movies/{slugify(movie.title.replace(' ', '_')).lower()}")
+
+def movie_video_path(movie):
+    videos_dir = settings.MOVIE_VIDEOS_DIR
+    slug = slugify(movie.title.replace(' ', '_')).lower()
+    for extension in VIDEO_EXTENSIONS:
+        path = os.path.join(videos_dir, f'{slug}.{extension}')
+        if os.path.exists(path):
+            return path
+    return None
+
+def movie_frames(movie):
+    # Si la película tiene vídeo se leen sus frames directamente, sin volcarlos antes a JPEG
+    frames_dir = movie_frames_dir(movie)
+    video_path = movie_video_path(movie) if settings.VIDEO_INGESTION else None
+    if video_path is not None:
+        return frames_dir, video_frame_names(video_path, settings.VIDEO_SAMPLE_RATE), video_path
+    if not os.path.exists(frames_dir):
+        return frames_dir, None, None
+    # En orden, para que los frames consecutivos de una escena lleguen seguidos
+    return frames_dir, sorted(os.listdir(frames_dir)), None
+
+def frame_deduplicator():
+    if not settings.FRAME_DEDUP:
+        return None
+    return FrameDeduplicator(settings.FRAME_DEDUP_MAX_DISTANCE)
+
+def emotion_model_paths():
+    resources_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources')
+    return [os.path.join(resources_path, f"{emotion}_detection.joblib") for emotion in ('happy', 'sad', 'angry')]
+
+def yolo_model_files():
+    yolo_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources', 'yolo')
+    return [
+        os.path.join(yolo_path, 'yolov3-face.cfg'),
+        os.path.join(yolo_path, 'yolov3-face.weights'),
+        os.path.join(yolo_path, 'face.names')
+    ]
+
+def movie_face_cache(frames_dir, yolo_files):
+    # Las detecciones de la película se comparten entre todos los actores del reparto
+    if not settings.FACE_DETECTION_CACHE:
+        return None
+    return FaceDetectionCache(face_cache_path(frames_dir), detector_version(yolo_files, 0.7))
+
+def analysis_version(actor_model_full_path, yolo_files):
+    # Los resultados guardados valen mientras no cambien el modelo del actor, los de emociones ni el detector
+    # Con eliminación de duplicados los resultados por frame son aproximados y no se mezclan con los exactos
+    dedup = settings.FRAME_DEDUP_MAX_DISTANCE if settings.FRAME_DEDUP else 'off'
+    return f'{files_version([actor_model_full_path])}-{files_version(emotion_model_paths())}-{detector_version(yolo_files, 0.7)}-{dedup}'
+
+def frame_ledger(frames_dir, actor_model_full_path, yolo_files):
+    if not settings.FRAME_LEDGER:
+        return None
+    return FrameLedger(frame_ledger_path(frames_dir, actor_model_full_path), analysis_version(actor_model_full_path, yolo_files))
+
+def face_score_store(frames_dir, actor_model_full_path, yolo_files):
+    if not settings.FACE_SCORE_STORE:
+        return None
+    floor = min(settings.FACE_SCORE_FLOOR, FRAME_THRESHOLDS['actor'])
+    return FaceScoreStore(score_store_path(frames_dir, actor_model_full_path), analysis_version(actor_model_full_path, yolo_files), floor)
+
+def analyze_performance(instance, progress=None, timings=None):
+    # Archivos de modelos
+    actor_model_full_path = actor_model_path(instance.actor)
+    happy_model_full_path, sad_model_full_path, angry_model_full_path = emotion_model_paths()
+
+    if not os.path.exists(actor_model_full_path):
+        return
+
+    # Archivos de YOLO
+    yolo_files = yolo_model_files()
+
+    # Verificar que todos los archivos existen
+    check_files_exist([actor_model_full_path, happy_model_full_path, sad_model_full_path, angry_model_full_path] + yolo_files)
+
+    actor_model = load_actor_model(actor_model_full_path)
+    happy_model = load_joblib(happy_model_full_path)
+    sad_model = load_joblib(sad_model_full_path)
+    angry_model = load_joblib(angry_model_full_path)
+
+    face_net, face_classes, face_output_layers = load_yolo_model('yolov3-face.cfg', 'yolov3-face.weights', 'face.names')
+    frames_dir, frame_files, video_path = movie_frames(instance.movie)
+
+    if frame_files is None:
+        return
+
+    face_cache = movie_face_cache(frames_dir, yolo_files)
+    ledger = frame_ledger(frames_dir, actor_model_full_path, yolo_files)
+    score_store = face_score_store(frames_dir, actor_model_full_path, yolo_files)
+    emotion_runtime = load_emotion_runtime(happy_model_full_path, sad_model_full_path, angry_model_full_path)
+    statistics = calculate_frame_statistics(frame_files, frames_dir, actor_model, happy_model, sad_model, angry_model, face_net, face_output_layers, progress=progress, emotion_runtime=emotion_runtime, face_cache=face_cache, ledger=ledger, score_store=score_store, timings=timings, video_path=video_path, deduplicator=frame_deduplicator())
+    update_performance_instance(instance, statistics)
+
+def analyze_movie(movie, performances=None, progress=None, timings=None):
+    if performances is None:
+        performances = movie.performance_set.select_related('actor')
+    performances = [performance for performance in performances if os.path.exists(actor_model_path(performance.actor))]
+    if not performances:
+        return []
+
+    actor_model_paths = {performance.id: actor_model_path(performance.actor) for performance in performances}
+    yolo_files = yolo_model_files()
+    check_files_exist(list(actor_model_paths.values()) + emotion_model_paths() + yolo_files)
+
+    # Todos los modelos del reparto se mantienen a la vez aunque la caché LRU expulse alguno
+    actor_models = {performance_id: load_actor_model(path) for performance_id, path in actor_model_paths.items()}
+    happy_model, sad_model, angry_model = [load_joblib(path) for path in emotion_model_paths()]
+
+    face_net, face_classes, face_output_layers = load_yolo_model('yolov3-face.cfg', 'yolov3-face.weights', 'face.names')
+    frames_dir, frame_files, video_path = movie_frames(movie)
+
+    if frame_files is None:
+        return []
+
+    # Una sola pasada por los frames para todo el reparto
+    face_cache = movie_face_cache(frames_dir, yolo_files)
+    ledgers = None
+    if settings.FRAME_LEDGER:
+        ledgers = {performance_id: frame_ledger(frames_dir, path, yolo_files) for performance_id, path in actor_model_paths.items()}
+    score_stores = None
+    if settings.FACE_SCORE_STORE:
+        score_stores = {performance_id: face_score_store(frames_dir, path, yolo_files) for performance_id, path in actor_model_paths.items()}
+    emotion_runtime = load_emotion_runtime(*emotion_model_paths())
+    statistics = calculate_movie_statistics(frame_files, frames_dir, actor_models, happy_model, sad_model, angry_model, face_net, face_output_layers, progress=progress, emotion_runtime=emotion_runtime, face_cache=face_cache, ledgers=ledgers, score_stores=score_stores, timings=timings, video_path=video_path, deduplicator=frame_deduplicator())
+    for performance in performances:
+        update_performance_instance(performance, statistics[performance.id])
+    return performances
+
+def preload_cast(movie):
+    # Se cargan los modelos del reparto mientras quepan en el presupuesto, para no expulsarse entre sí
+    preloaded = 0
+    for performance in movie.performance_set.select_related('actor'):
+        path = actor_model_path(performance.actor)
+        if not os.path.exists(path):
+            continue
+        if not actor_model_registry.is_loaded(path) and not actor_model_registry.fits(os.path.getsize(path)):
+            break
+        load_actor_model(path)
+        preloaded += 1
+    return preloaded
+
+def enqueue_analysis(performance):
+    PerformanceAnalysisJob = apps.get_model('movies', 'PerformanceAnalysisJob')
+    return enqueue_job(PerformanceAnalysisJob, {'performance': performance}, processedFrames=0, totalFrames=0)
+
+def analysis_running(performance):
+    PerformanceAnalysisJob = apps.get_model('movies', 'PerformanceAnalysisJob')
+    return PerformanceAnalysisJob.objects.filter(performance=performance, status=PerformanceAnalysisJob.Status.RUNNING).exists()
+
+def claim_analysis_job():
+    # Cada worker procesa un trabajo cada vez
+    claimed = job_queue.claim_job(apps.get_model('movies', 'PerformanceAnalysisJob'))
+    if claimed is None:
+        return None
+    return claimed.select_related('performance__actor', 'performance__movie').get()
+
+def claim_movie_jobs(job):
+    PerformanceAnalysisJob = apps.get_model('movies', 'PerformanceAnalysisJob')
+    # El resto de trabajos pendientes de la película pasan a este worker con el mismo token
+    pending_ids = PerformanceAnalysisJob.objects.filter(
+        performance__movie=job.performance.movie, status=PerformanceAnalysisJob.Status.PENDING
+    ).values_list('id', flat=True)
+    return job_queue.claim(PerformanceAnalysisJob, list(pending_ids), token=job.claimToken)
+
+def run_analysis_job():
+    PerformanceAnalysisJob = apps.get_model('movies', 'PerformanceAnalysisJob')
+    job = claim_analysis_job()
+    if job is None:
+        return None
+
+    if settings.PERFORMANCE_ANALYSIS_BY_MOVIE:
+        jobs = claim_movie_jobs(job)
+    else:
+        jobs = PerformanceAnalysisJob.objects.filter(id=job.id, claimToken=job.claimToken)
+    last_saved = 0
+
+    # Se actualiza con update() para no disparar señales en cada guardado
+    def progress(processed_frames, total_frames):
+        nonlocal last_saved
+        now = time.monotonic()
+        if now - last_saved >= PROGRESS_INTERVAL or processed_frames == total_frames:
+            jobs.update(processedFrames=processed_frames, totalFrames=total_frames)
+            last_saved = now
+
+    timings = StageTimings()
+    try:
+        performances = [claimed.performance for claimed in jobs.select_related('performance__actor')]
+        # Antes de recorrer los frames, tanto para una actuación como para la película entera
+        preload_cast(job.performance.movie)
+        if len(performances) > 1:
+            analyze_movie(job.performance.movie, performances, progress=progress, timings=timings)
+        else:
+            analyze_performance(job.performance, progress=progress, timings=timings)
+        jobs.update(status=PerformanceAnalysisJob.Status.DONE, finishedAt=timezone.now())
+    except Exception as e:
+        jobs.update(status=PerformanceAnalysisJob.Status.FAILED, error=str(e), finishedAt=timezone.now())
+
+    job.refresh_from_db()
+    # Tiempo por etapa del último trabajo, para ver si limita la lectura de frames o la inferencia
+    job.timings = timings
+    logger.info('Analysis of %s: %s', job.performance, timings.summary())
+    return job
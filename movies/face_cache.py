@@ -0,0 +1,82 @@
+from django.conf import settings
+from ai_models.registry import file_stamp, file_digest
+from .npz_files import load_npz, save_npz
+import hashlib
+import os
+import numpy as np
+
+# Tamaño de entrada de la red; si cambia las detecciones guardadas dejan de valer
+DETECTOR_INPUT_SIZE = 416
+
+_digests = {}
+
+def files_version(paths):
+    # El hash de los modelos solo se recalcula cuando cambian los archivos
+    key = tuple(paths)
+    stamp = file_stamp(paths)
+    if key not in _digests or _digests[key][0] != stamp:
+        _digests[key] = (stamp, file_digest(paths))
+    return _digests[key][1]
+
+def detector_version(yolo_files, threshold):
+    # Detectar sobre frames reducidos mueve ligeramente las cajas
+    reduced = settings.FRAME_REDUCED_DECODE_MIN_SIZE if settings.FRAME_REDUCED_DECODE else 0
+    return f'{files_version(yolo_files)}-{DETECTOR_INPUT_SIZE}-{threshold}-{reduced}'
+
+def frame_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def face_cache_path(frames_dir):
+    return os.path.join(settings.FACE_DETECTION_CACHE_DIR, f'{os.path.basename(os.path.normpath(frames_dir))}.npz')
+
+class FaceDetectionCache:
+    # Detecciones de una película por hash de frame: cajas y confianzas en arrays planos con desplazamientos
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.faces = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        data = load_npz(self.path, version=self.version)
+        if data is None:
+            return
+        offsets = data['offsets']
+        boxes = data['boxes'].tolist()
+        confidences = data['confidences'].tolist()
+        for index, key in enumerate(data['hashes'].tolist()):
+            start, end = offsets[index], offsets[index + 1]
+            self.faces[key] = list(zip(boxes[start:end], confidences[start:end]))
+
+    def get(self, key):
+        faces = self.faces.get(key)
+        if faces is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return faces
+
+    def set(self, key, faces):
+        self.faces[key] = faces
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        hashes = list(self.faces)
+        offsets = np.cumsum([0] + [len(self.faces[key]) for key in hashes])
+        boxes = [box for key in hashes for box, confidence in self.faces[key]]
+        confidences = [confidence for key in hashes for box, confidence in self.faces[key]]
+
+        save_npz(
+            self.path,
+            version=np.array(self.version),
+            hashes=np.array(hashes, dtype='U32'),
+            offsets=offsets.astype(np.int64),
+            boxes=np.array(boxes, dtype=np.int32).reshape(-1, 4),
+            confidences=np.array(confidences, dtype=np.float64),
+        )
+        self.dirty = False
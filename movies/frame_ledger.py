@@ -0,0 +1,81 @@
+from django.conf import settings
+import os
+import time
+import numpy as np
+from .npz_files import load_npz, save_npz
+
+# Bits de resultado de cada frame
+FRAME_ACTOR = 1
+FRAME_HAPPY = 2
+FRAME_ANGRY = 4
+FRAME_SAD = 8
+
+# Cada cuánto se guarda el registro durante un análisis, para poder retomarlo si se interrumpe
+LEDGER_SAVE_INTERVAL = 5.0
+
+def frame_stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def count_frame_flags(flags):
+    flags = np.asarray(flags, dtype=np.uint8)
+    return {
+        'actor_frame_count': int(np.count_nonzero(flags & FRAME_ACTOR)),
+        'happy_frame_count': int(np.count_nonzero(flags & FRAME_HAPPY)),
+        'angry_frame_count': int(np.count_nonzero(flags & FRAME_ANGRY)),
+        'sadness_frame_count': int(np.count_nonzero(flags & FRAME_SAD)),
+    }
+
+def frame_ledger_path(frames_dir, actor_model_path):
+    actor = os.path.splitext(os.path.basename(actor_model_path))[0]
+    return os.path.join(settings.FRAME_LEDGER_DIR, os.path.basename(os.path.normpath(frames_dir)), f'{actor}.npz')
+
+class FrameLedger:
+    # Resultado por frame de un actor: fecha y tamaño del archivo y un byte con los bits de resultado
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.entries = {}
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        self.load()
+
+    def load(self):
+        # Con otros modelos o umbrales los resultados guardados no sirven
+        data = load_npz(self.path, version=self.version)
+        if data is None:
+            return
+        for name, stamp, flags in zip(data['names'].tolist(), data['stamps'].tolist(), data['flags'].tolist()):
+            self.entries[name] = (tuple(stamp), flags)
+
+    def is_current(self, name, stamp):
+        entry = self.entries.get(name)
+        return entry is not None and entry[0] == stamp
+
+    def record(self, name, stamp, flags):
+        self.entries[name] = (stamp, int(flags))
+        self.dirty = True
+
+    def statistics(self, frame_files):
+        # Los frames borrados del directorio dejan de contar aunque sigan en el registro
+        flags = [self.entries[name][1] for name in frame_files if name in self.entries]
+        return {'total_frames': len(frame_files), **count_frame_flags(flags)}
+
+    def save_if_due(self):
+        if time.monotonic() - self.last_saved >= LEDGER_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        self.last_saved = time.monotonic()
+        if not self.dirty:
+            return
+        names = list(self.entries)
+
+        save_npz(
+            self.path,
+            version=np.array(self.version),
+            names=np.array(names, dtype=str),
+            stamps=np.array([self.entries[name][0] for name in names], dtype=np.int64).reshape(-1, 2),
+            flags=np.array([self.entries[name][1] for name in names], dtype=np.uint8),
+        )
+        self.dirty = False
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_alter_actor_birthday_alter_review_publicationdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceAnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=50)),
+                ('processedFrames', models.PositiveIntegerField(default=0)),
+                ('totalFrames', models.PositiveIntegerField(default=0)),
+                ('claimToken', models.CharField(blank=True, max_length=32)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('startedAt', models.DateTimeField(blank=True, null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('performance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_job', to='movies.performance')),
+            ],
+        ),
+    ]
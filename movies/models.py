@@ -1,6 +1,7 @@
 from datetime import date
 from django.apps import apps
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from djmoney.models.fields import MoneyField
@@ -154,9 +155,44 @@ class Performance(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(10000)]
     )
 
+    def save(self, *args, **kwargs):
+        # Con el análisis diferido el trabajo se encola en post_save: si no se puede encolar, la actuación tampoco se guarda
+        if not settings.PERFORMANCE_ANALYSIS_DEFERRED:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.actor.name} as {self.characterName} in {self.movie.title}'
     
+class PerformanceAnalysisJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    performance = models.OneToOneField(Performance, on_delete=models.CASCADE, related_name='analysis_job')
+    status = models.CharField(
+        max_length=50,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    processedFrames = models.PositiveIntegerField(default=0)
+    totalFrames = models.PositiveIntegerField(default=0)
+    claimToken = models.CharField(max_length=32, blank=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    startedAt = models.DateTimeField(blank=True, null=True)
+    finishedAt = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    @property
+    def progress(self):
+        return self.processedFrames / self.totalFrames if self.totalFrames else 0
+
+    def __str__(self):
+        return f'{self.status}: analysis of {self.performance} ({self.processedFrames}/{self.totalFrames})'
+
 class Emotion(models.Model):
     name = models.CharField(max_length=50, unique=True)
     modelName = models.CharField(max_length=50)
@@ -0,0 +1,19 @@
+import os
+import numpy as np
+
+def load_npz(path, **expected):
+    # Devuelve los arrays guardados, o None si no hay archivo o se guardó con otra versión
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        for key, value in expected.items():
+            if value is not None and data[key].item() != value:
+                return None
+        return {key: data[key] for key in data.files}
+
+def save_npz(path, **arrays):
+    # Se escribe en un temporal y se renombra para que otro worker nunca lea un archivo a medias
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(temporary_path, **arrays)
+    os.replace(temporary_path, path)
@@ -0,0 +1,100 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import itertools
+import queue
+import threading
+import time
+
+class StageTimings:
+    # Segundos acumulados por etapa; la lectura suma el tiempo de todos los hilos
+    def __init__(self):
+        self.seconds = {}
+        self.frames = 0
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed(self, stage, function):
+        def wrapper(*args):
+            with self.measure(stage):
+                return function(*args)
+        return wrapper
+
+    def summary(self):
+        with self.lock:
+            seconds = dict(self.seconds)
+        return ', '.join(
+            f'{stage} {total:.3f} s ({total / self.frames * 1000:.2f} ms/frame)' if self.frames else f'{stage} {total:.3f} s'
+            for stage, total in seconds.items()
+        )
+
+def prefetch(items, load, workers, depth, timings=None):
+    # Como mucho depth elementos cargados o en curso, para acotar la memoria; se devuelven en orden
+    if workers <= 0:
+        for item in items:
+            yield load(item)
+        return
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(load, item) for item in itertools.islice(items, max(depth, 1)))
+        while pending:
+            future = pending.popleft()
+            start = time.perf_counter()
+            result = future.result()
+            if timings is not None:
+                timings.add('wait', time.perf_counter() - start)
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(load, item))
+            yield result
+
+def background(iterator, depth, timings=None):
+    # Para lecturas secuenciales (un vídeo): un único hilo produce por delante en una cola acotada
+    items = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(('item', item)):
+                    return
+        except Exception as e:
+            put(('error', e))
+            return
+        put(('done', None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            start = time.perf_counter()
+            kind, value = items.get()
+            if timings is not None:
+                timings.add('wait', time.perf_counter() - start)
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+    finally:
+        stop.set()
@@ -0,0 +1,131 @@
+from django.conf import settings
+import os
+import time
+import numpy as np
+from .npz_files import load_npz, save_npz
+from .frame_ledger import FRAME_ACTOR, FRAME_HAPPY, FRAME_ANGRY, FRAME_SAD, LEDGER_SAVE_INTERVAL
+
+# Umbrales con los que se resumen las puntuaciones de cada rostro
+FRAME_THRESHOLDS = {'actor': 0.7, 'happy': 0.7, 'angry': 0.7, 'sadness': 0.8}
+
+def frame_flags(frame_count, face_frames, actor_scores, happy_scores, angry_scores, sad_scores, thresholds=FRAME_THRESHOLDS):
+    flags = np.zeros(frame_count, dtype=np.uint8)
+    matches = np.flatnonzero(np.asarray(actor_scores) > thresholds['actor'])
+
+    # Como en el recorrido frame a frame, solo cuenta el primer rostro del actor de cada frame
+    frames, first = np.unique(np.asarray(face_frames)[matches], return_index=True)
+    faces = matches[first]
+    flags[frames] = (
+        FRAME_ACTOR
+        | np.where(np.asarray(happy_scores)[faces] > thresholds['happy'], FRAME_HAPPY, 0)
+        | np.where(np.asarray(angry_scores)[faces] > thresholds['angry'], FRAME_ANGRY, 0)
+        | np.where(np.asarray(sad_scores)[faces] > thresholds['sadness'], FRAME_SAD, 0)
+    )
+    return flags
+
+def score_store_path(frames_dir, actor_model_path):
+    actor = os.path.splitext(os.path.basename(actor_model_path))[0]
+    return os.path.join(settings.FACE_SCORE_DIR, os.path.basename(os.path.normpath(frames_dir)), f'{actor}.npz')
+
+class FaceScoreStore:
+    # Puntuaciones de cada rostro de un actor en una película, una columna por modelo
+    COLUMNS = ['actor', 'happy', 'angry', 'sad']
+
+    def __init__(self, path, version=None, floor=None):
+        self.path = path
+        self.version = version
+        self.floor = floor
+        self.names = []
+        self.frames = np.empty(0, dtype=np.int32)
+        self.scores = {column: np.empty(0, dtype=np.float32) for column in self.COLUMNS}
+        self.recorded = {}
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        self.load()
+
+    def load(self):
+        # Sin versión se acepta lo guardado, como al volver a aplicar umbrales
+        data = load_npz(self.path, version=self.version, floor=self.floor if self.version is not None else None)
+        if data is None:
+            return
+        self.version = str(data['version'])
+        self.floor = float(data['floor'])
+        self.names = data['names'].tolist()
+        self.frames = data['frames']
+        self.scores = {column: data[column] for column in self.COLUMNS}
+
+    def record(self, frame_names, face_frames, actor_scores, happy_scores, angry_scores, sad_scores):
+        # Solo se guardan los rostros que algún umbral admisible podría atribuir al actor
+        keep = np.asarray(actor_scores) > self.floor
+        columns = [actor_scores, happy_scores, angry_scores, sad_scores]
+        for frame_index, name in enumerate(frame_names):
+            faces = keep & (np.asarray(face_frames) == frame_index)
+            self.recorded[name] = [np.asarray(values, dtype=np.float32)[faces] for values in columns]
+        self.dirty = True
+
+    def frame_scores(self, name):
+        if name in self.recorded:
+            return self.recorded[name]
+        if name in self.names:
+            rows = self.frames == self.names.index(name)
+            return [self.scores[column][rows] for column in self.COLUMNS]
+        return [np.empty(0, dtype=np.float32) for column in self.COLUMNS]
+
+    def stored_frames(self):
+        return set(self.names) | set(self.recorded)
+
+    def repeat(self, name, previous):
+        # Los frames casi idénticos al anterior comparten sus puntuaciones
+        self.recorded[name] = self.frame_scores(previous)
+        self.dirty = True
+
+    def merge(self, frame_files=None):
+        # Las filas de los frames recién analizados sustituyen a las anteriores; los frames borrados se descartan
+        frame_files = set(frame_files) if frame_files is not None else None
+        kept_names = [
+            name for name in self.names
+            if name not in self.recorded and (frame_files is None or name in frame_files)
+        ]
+        kept_indices = {name: index for index, name in enumerate(self.names)}
+        old_rows = np.isin(self.frames, [kept_indices[name] for name in kept_names])
+
+        names = kept_names + [name for name in self.recorded if frame_files is None or name in frame_files]
+        positions = {name: index for index, name in enumerate(names)}
+        remap = np.array([positions.get(name, -1) for name in self.names], dtype=np.int32)
+        frames = [remap[self.frames[old_rows]]]
+        scores = {column: [self.scores[column][old_rows]] for column in self.COLUMNS}
+        for name, columns in self.recorded.items():
+            if name not in positions:
+                continue
+            frames.append(np.full(len(columns[0]), positions[name], dtype=np.int32))
+            for column, values in zip(self.COLUMNS, columns):
+                scores[column].append(values)
+
+        self.names = names
+        self.frames = np.concatenate(frames).astype(np.int32)
+        self.scores = {column: np.concatenate(values).astype(np.float32) for column, values in scores.items()}
+        self.recorded = {}
+
+    def flags(self, thresholds=FRAME_THRESHOLDS):
+        self.merge()
+        return frame_flags(len(self.names), self.frames, *[self.scores[column] for column in self.COLUMNS], thresholds=thresholds)
+
+    def save_if_due(self):
+        if time.monotonic() - self.last_saved >= LEDGER_SAVE_INTERVAL:
+            self.save()
+
+    def save(self, frame_files=None):
+        self.last_saved = time.monotonic()
+        if not self.dirty and frame_files is None:
+            return
+        self.merge(frame_files)
+
+        save_npz(
+            self.path,
+            version=np.array(self.version),
+            floor=np.array(self.floor),
+            names=np.array(self.names, dtype=str),
+            frames=self.frames,
+            **self.scores,
+        )
+        self.dirty = False
@@ -6,7 +6,7 @@ import os
 from django.conf import settings
 from django.utils.text import slugify
 import shutil
-from .utils import (load_joblib, load_yolo_model, calculate_frame_statistics, update_performance_instance, check_files_exist)
+from .analysis import analyze_performance, actor_model_path, analysis_running, enqueue_analysis
 
 @receiver(post_save, sender=Movie)
 def create_movie_directory(sender, instance, created, **kwargs):
@@ -26,48 +26,17 @@ def delete_movie_images(sender, instance, **kwargs):
 def performance_post_save(sender, instance, created, **kwargs):
     if instance.screenTime:
         return
-    
-    post_save.disconnect(performance_post_save, sender=Performance)
-
-    try:
-        resources_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources')
-        yolo_path = os.path.join(resources_path, 'yolo')
-        
-        # Archivos de modelos
-        actor_model_filename = f"{slugify(instance.actor.name.replace(' ', '_')).lower()}_detection.joblib"
-        actor_model_full_path = os.path.join(resources_path, actor_model_filename)
-        happy_model_full_path = os.path.join(resources_path, "happy_detection.joblib")
-        sad_model_full_path = os.path.join(resources_path, "sad_detection.joblib")
-        angry_model_full_path = os.path.join(resources_path, "angry_detection.joblib")
-
-        if not os.path.exists(actor_model_full_path):
-            return
-
-        # Archivos de YOLO
-        yolo_files = [
-            os.path.join(yolo_path, 'yolov3-face.cfg'),
-            os.path.join(yolo_path, 'yolov3-face.weights'),
-            os.path.join(yolo_path, 'face.names')
-        ]
 
-        # Verificar que todos los archivos existen
-        check_files_exist([actor_model_full_path, happy_model_full_path, sad_model_full_path, angry_model_full_path] + yolo_files)
-
-        if os.path.exists(actor_model_full_path):
-            actor_model = load_joblib(actor_model_full_path)
-            happy_model = load_joblib(happy_model_full_path)
-            sad_model = load_joblib(sad_model_full_path)
-            angry_model = load_joblib(angry_model_full_path)
-
-            face_net, face_classes, face_output_layers = load_yolo_model('yolov3-face.cfg', 'yolov3-face.weights', 'face.names')
-            frames_dir = os.path.join(settings.MEDIA_ROOT, f"images/movies/{slugify(instance.movie.title.replace(' ', '_')).lower()}")
+    if settings.PERFORMANCE_ANALYSIS_DEFERRED:
+        # El propio worker guarda la actuación al terminar; eso no debe volver a encolarla
+        if os.path.exists(actor_model_path(instance.actor)) and not analysis_running(instance):
+            enqueue_analysis(instance)
+        return
 
-            if not os.path.exists(frames_dir):
-                return
+    post_save.disconnect(performance_post_save, sender=Performance)
 
-            frame_files = [f for f in os.listdir(frames_dir)]
-            statistics = calculate_frame_statistics(frame_files, frames_dir, actor_model, happy_model, sad_model, angry_model, face_net, face_output_layers)
-            update_performance_instance(instance, statistics)
+    try:
+        analyze_performance(instance)
     finally:
         post_save.connect(performance_post_save, sender=Performance)
 
@@ -1,20 +1,46 @@
-from django.test import TestCase, Client
-from unittest.mock import patch, MagicMock
+from django.test import TestCase, Client, override_settings
+from unittest import skipUnless
+from unittest.mock import patch, MagicMock, ANY
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.apps import apps
 from djmoney.money import Money
-from movies.models import Review, HomeImage, Movie, Genre, Actor, Gender, Performance
+from movies.models import Review, HomeImage, Movie, Genre, Actor, Gender, Performance, PerformanceAnalysisJob
+from movies.analysis import run_analysis_job, movie_frames
 from movies.utils import (
     check_files_exist,
     detect_faces,
-    calculate_frame_statistics
+    detect_faces_batch,
+    decode_detections,
+    calculate_frame_statistics,
+    calculate_movie_statistics,
+    cached_frame_batches,
+    detect_frame_batches,
+    reduction_factor,
+    video_frame_names,
+    face_crops,
+    load_emotion_runtime,
+    EmotionRuntime,
+    FrameDeduplicator
 )
+from movies.face_cache import FaceDetectionCache
+from ai_models.registry import model_registry
+from movies.frame_ledger import FrameLedger, count_frame_flags
+from movies.score_store import FRAME_THRESHOLDS, FaceScoreStore
+from movies.pipeline import StageTimings, background, prefetch
 from django.utils import timezone
 from news.models import New, Category
 from unittest.mock import patch
 from movies.views import calculate_hate_score
 from datetime import date
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import joblib
+import shutil
+import tempfile
+import threading
+import time
 import numpy as np
 import cv2
 import os
@@ -550,14 +576,15 @@ class ActorDetailViewTest(TestCase):
         self.assertEqual(response.context['performances'].count(), 1)
         self.assertEqual(response.context['performances'].first(), self.performance)
 
+@override_settings(PERFORMANCE_ANALYSIS_DEFERRED=False, FACE_DETECTION_CACHE=False, FRAME_LEDGER=False, FACE_SCORE_STORE=False)
 class PerformancePostSaveTest(TestCase):
 
     def setUp(self):
-        self.check_files_exist_patcher = patch('movies.signals.check_files_exist')
-        self.load_joblib_patcher = patch('movies.signals.load_joblib')
-        self.load_yolo_model_patcher = patch('movies.signals.load_yolo_model')
-        self.calculate_frame_statistics_patcher = patch('movies.signals.calculate_frame_statistics')
-        self.update_performance_instance_patcher = patch('movies.signals.update_performance_instance')
+        self.check_files_exist_patcher = patch('movies.analysis.check_files_exist')
+        self.load_joblib_patcher = patch('movies.analysis.load_joblib')
+        self.load_yolo_model_patcher = patch('movies.analysis.load_yolo_model')
+        self.calculate_frame_statistics_patcher = patch('movies.analysis.calculate_frame_statistics')
+        self.update_performance_instance_patcher = patch('movies.analysis.update_performance_instance')
 
         self.mock_check_files_exist = self.check_files_exist_patcher.start()
         self.mock_load_joblib = self.load_joblib_patcher.start()
@@ -651,6 +678,122 @@ class PerformancePostSaveTest(TestCase):
         self.mock_calculate_frame_statistics.assert_not_called()
         self.mock_update_performance_instance.assert_not_called()
 
+@override_settings(PERFORMANCE_ANALYSIS_DEFERRED=True)
+class PerformanceAnalysisJobTest(TestCase):
+
+    def setUp(self):
+        self.actor_model_path_patcher = patch('movies.signals.actor_model_path', return_value=__file__)
+        self.actor_model_path_patcher.start()
+        self.analyze_performance_patcher = patch('movies.analysis.analyze_performance')
+        self.mock_analyze_performance = self.analyze_performance_patcher.start()
+
+        self.actor = Actor.objects.create(
+            name="Will Smith",
+            gender="Male",
+            birthday=date(1990, 1, 1),
+            nationality="Test Nationality",
+            principalImage="path/to/image.jpg",
+            height=180.0,
+            weight=75.0,
+            hair_color="Brown",
+            eye_color="Blue"
+        )
+        self.movie = Movie.objects.create(
+            title="Test Movie",
+            director="Test Director",
+            releaseYear=2023,
+            image="path/to/movie_image.jpg",
+            duration=120,
+            country="Test Country",
+            budget=100000,
+            revenue=150000
+        )
+        self.performance = Performance.objects.create(actor=self.actor, movie=self.movie, screenTime=None)
+
+    def tearDown(self):
+        Movie.objects.all().delete()
+        patch.stopall()
+
+    def test_save_enqueues_instead_of_analysing(self):
+        self.mock_analyze_performance.assert_not_called()
+        job = PerformanceAnalysisJob.objects.get(performance=self.performance)
+        self.assertEqual(job.status, PerformanceAnalysisJob.Status.PENDING)
+
+        self.performance.screenTime = 50
+        self.performance.save()
+        self.assertEqual(PerformanceAnalysisJob.objects.count(), 1)
+
+    def test_performance_is_not_saved_without_its_job(self):
+        with patch('movies.signals.enqueue_analysis', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                Performance.objects.create(actor=self.actor, movie=self.movie, characterName='Other', screenTime=None)
+        self.assertEqual(Performance.objects.count(), 1)
+
+    def test_worker_records_progress_and_result(self):
+        def analyze(instance, progress, timings):
+            for frame in range(1, 4):
+                progress(frame, 3)
+            # Guardar el resultado desde el worker no vuelve a encolar la actuación
+            instance.screenTime = 0
+            instance.save()
+
+        self.mock_analyze_performance.side_effect = analyze
+        job = run_analysis_job()
+        self.assertEqual(job.status, PerformanceAnalysisJob.Status.DONE)
+        self.assertEqual((job.processedFrames, job.totalFrames, job.progress), (3, 3, 1))
+        self.assertIsNone(run_analysis_job())
+
+    @patch('movies.analysis.load_actor_model')
+    def test_worker_preloads_the_cast(self, mock_load_actor_model):
+        other_actor = Actor.objects.create(
+            name="Macaulay Culkin",
+            gender="Male",
+            birthday=date(1990, 1, 1),
+            nationality="Test Nationality",
+            principalImage="path/to/image.jpg",
+            height=180.0,
+            weight=75.0,
+            hair_color="Brown",
+            eye_color="Blue"
+        )
+        Performance.objects.create(actor=other_actor, movie=self.movie, screenTime=10)
+
+        with patch('movies.analysis.actor_model_path', side_effect=lambda actor: __file__):
+            run_analysis_job()
+        self.assertEqual(mock_load_actor_model.call_count, 2)
+
+    @override_settings(PERFORMANCE_ANALYSIS_BY_MOVIE=True)
+    @patch('movies.analysis.preload_cast')
+    @patch('movies.analysis.analyze_movie')
+    def test_worker_analyses_the_whole_cast_in_one_pass(self, mock_analyze_movie, mock_preload_cast):
+        other_actor = Actor.objects.create(
+            name="Macaulay Culkin",
+            gender="Male",
+            birthday=date(1990, 1, 1),
+            nationality="Test Nationality",
+            principalImage="path/to/image.jpg",
+            height=180.0,
+            weight=75.0,
+            hair_color="Brown",
+            eye_color="Blue"
+        )
+        other_performance = Performance.objects.create(actor=other_actor, movie=self.movie, screenTime=None)
+
+        mock_analyze_movie.side_effect = lambda *args, **kwargs: mock_preload_cast.assert_called_once_with(self.movie)
+        job = run_analysis_job()
+        mock_analyze_movie.assert_called_once()
+        self.assertEqual({performance.id for performance in mock_analyze_movie.call_args.args[1]}, {self.performance.id, other_performance.id})
+        self.mock_analyze_performance.assert_not_called()
+        self.assertEqual(job.status, PerformanceAnalysisJob.Status.DONE)
+        self.assertEqual(PerformanceAnalysisJob.objects.filter(status=PerformanceAnalysisJob.Status.DONE).count(), 2)
+        self.assertIsNone(run_analysis_job())
+
+    def test_worker_stores_errors(self):
+        self.mock_analyze_performance.side_effect = FileNotFoundError('File not found: yolov3-face.weights')
+        job = run_analysis_job()
+        self.assertEqual(job.status, PerformanceAnalysisJob.Status.FAILED)
+        self.assertIn('yolov3-face.weights', job.error)
+
 class UtilsTestCase(TestCase):
 
     def setUp(self):
@@ -705,15 +848,76 @@ class UtilsTestCase(TestCase):
         self.assertIsInstance(faces, list)
         self.assertGreaterEqual(len(faces), 1)
 
+    def test_decode_detections_matches_recorded_outputs(self):
+        # Salidas de YOLO grabadas junto con las caras que daba el decodificado fila a fila
+        recorded = np.load(os.path.join(os.path.dirname(__file__), 'test_data', 'yolo_outputs.npz'))
+        faces = decode_detections([recorded['layer_13'], recorded['layer_26']], int(recorded['width']), int(recorded['height']), float(recorded['threshold']))
+        expected = list(zip(recorded['boxes'].tolist(), recorded['confidences'].tolist()))
+        self.assertEqual(faces, expected)
+        self.assertEqual(decode_detections([], 416, 416, 0.7), [])
+
+    def test_detect_faces_batch_scales_boxes_per_frame(self):
+        images = [np.zeros((416, 416, 3), dtype=np.uint8), np.zeros((200, 400, 3), dtype=np.uint8)]
+        detections = np.array([
+            [[0.5, 0.5, 0.1, 0.1, 0, 0.9]],
+            [[0.5, 0.5, 0.5, 0.5, 0, 0.8]],
+        ])
+
+        # OpenCV puede devolver el lote como (N, filas, columnas) o apilado en 2D
+        for outs in [[detections], [detections.reshape(2, 6)]]:
+            self.net.forward.return_value = outs
+            faces = detect_faces_batch(images, self.net, self.output_layers, threshold=0.7)
+            self.assertEqual(faces, [[([187, 187, 41, 41], 0.9)], [([100, 50, 200, 100], 0.8)]])
+
+        # Mismo resultado que detectando frame a frame
+        for index, image in enumerate(images):
+            self.net.forward.return_value = [detections[index]]
+            self.assertEqual(detect_faces(image, self.net, self.output_layers, threshold=0.7), faces[index])
+
+    def test_calculate_frame_statistics_batches_detection(self):
+        with patch('movies.utils.detect_faces_batch', side_effect=lambda images, *args, **kwargs: [[] for image in images]) as mock_detect_faces_batch:
+            statistics = calculate_frame_statistics(self.frame_files * 3, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, self.face_net, self.face_output_layers, batch_size=4)
+        self.assertEqual([len(call.args[0]) for call in mock_detect_faces_batch.call_args_list], [4, 2])
+        self.assertEqual(statistics['total_frames'], 6)
+        self.assertEqual(statistics['actor_frame_count'], 0)
+
+    @override_settings(FRAME_DECODE_WORKERS=0)
+    def test_calculate_frame_statistics_keeps_first_actor_face_per_frame(self):
+        # Cada rostro es un bloque de un gris distinto y los modelos puntúan por su brillo medio
+        frames = [[0.5, 0.9, 0.95], [0.2], [0.75, 0.99]]
+        images = []
+        for values in frames:
+            image = np.zeros((100, 100 * len(values), 3), dtype=np.uint8)
+            for index, value in enumerate(values):
+                image[:, index * 100:(index + 1) * 100] = int(value * 255)
+            images.append(image)
+        faces = [[([index * 100, 0, 100, 100], 0.9) for index in range(len(values))] for values in frames]
+
+        self.actor_model.predict.side_effect = lambda batch: batch.mean(axis=(1, 2, 3))
+        self.happy_model.predict.side_effect = lambda batch: batch.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.angry_model.predict.side_effect = lambda batch: 1 - batch.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.sad_model.predict.side_effect = lambda batch: batch.mean(axis=(1, 2, 3)).reshape(-1, 1)
+
+        with patch('cv2.imread', side_effect=images), patch('movies.utils.detect_faces_batch', return_value=faces):
+            statistics = calculate_frame_statistics(['a.jpg', 'b.jpg', 'c.jpg'], self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, self.face_net, self.face_output_layers, batch_size=3)
+
+        # Un predict por modelo; en el tercer frame cuenta el rostro 0.75 (no triste) y no el 0.99
+        self.assertEqual(self.actor_model.predict.call_count, 1)
+        self.assertEqual(self.sad_model.predict.call_count, 1)
+        self.assertEqual(statistics['actor_frame_count'], 2)
+        self.assertEqual(statistics['happy_frame_count'], 2)
+        self.assertEqual(statistics['angry_frame_count'], 0)
+        self.assertEqual(statistics['sadness_frame_count'], 1)
+
     @patch('cv2.imread', return_value=np.zeros((416, 416, 3), dtype=np.uint8))
-    @patch('movies.utils.detect_faces', return_value=[((0, 0, 50, 50), 0.9)])
+    @patch('movies.utils.detect_faces_batch', side_effect=lambda images, *args, **kwargs: [[((0, 0, 50, 50), 0.9)] for image in images])
     @patch('movies.utils.preprocess_face_for_actor_model', return_value=np.zeros((1, 100, 100, 1)))
     @patch('movies.utils.preprocess_face_for_emotion_model', return_value=np.zeros((1, 48, 48, 1)))
-    def test_calculate_frame_statistics(self, mock_preprocess_face_for_emotion_model, mock_preprocess_face_for_actor_model, mock_detect_faces, mock_imread):
-        self.actor_model.predict.return_value = 0.8
-        self.happy_model.predict.return_value = 0.8
-        self.sad_model.predict.return_value = 0.9
-        self.angry_model.predict.return_value = 0.8
+    def test_calculate_frame_statistics(self, mock_preprocess_face_for_emotion_model, mock_preprocess_face_for_actor_model, mock_detect_faces_batch, mock_imread):
+        self.actor_model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.8)
+        self.happy_model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.8)
+        self.sad_model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.9)
+        self.angry_model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.8)
 
         statistics = calculate_frame_statistics(self.frame_files, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, self.face_net, self.face_output_layers)
         
@@ -722,4 +926,520 @@ class UtilsTestCase(TestCase):
         self.assertEqual(statistics['happy_frame_count'], 2)
         self.assertEqual(statistics['angry_frame_count'], 2)
         self.assertEqual(statistics['sadness_frame_count'], 2)
-    
\ No newline at end of file
+    
+    def test_calculate_movie_statistics_matches_one_pass_per_actor(self):
+        # Tres rostros por frame; cada actor reconoce un tono de gris distinto
+        values = [0.2, 0.5, 0.9]
+        image = np.zeros((100, 300, 3), dtype=np.uint8)
+        for index, value in enumerate(values):
+            image[:, index * 100:(index + 1) * 100] = int(value * 255)
+        faces = [([index * 100, 0, 100, 100], 0.9) for index in range(len(values))]
+        frame_files = ['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg']
+
+        actor_models = {}
+        for key, value in enumerate(values):
+            actor_models[key] = MagicMock()
+            actor_models[key].predict.side_effect = lambda batch, value=value: 1 - np.abs(batch.mean(axis=(1, 2, 3)) - value)
+        self.set_emotion_predictions()
+
+        def statistics_for(models):
+            with patch('cv2.imread', return_value=image), patch('movies.utils.detect_faces_batch', side_effect=lambda images, *args, **kwargs: [faces for image in images]) as mock_detect_faces_batch:
+                statistics = calculate_movie_statistics(frame_files, self.frames_dir, models, self.happy_model, self.sad_model, self.angry_model, self.face_net, self.face_output_layers, batch_size=2)
+            return statistics, mock_detect_faces_batch.call_count
+
+        with override_settings(EMOTION_FUSED_RUNTIME=False):
+            statistics, detections = statistics_for(actor_models)
+            separate = {key: statistics_for({key: model})[0][key] for key, model in actor_models.items()}
+
+        # Una detección por lote para todo el reparto, con los mismos resultados que actor a actor
+        self.assertEqual(detections, 2)
+        self.assertEqual(statistics, separate)
+        self.assertEqual(statistics[2], {'total_frames': 4, 'actor_frame_count': 4, 'happy_frame_count': 4, 'angry_frame_count': 0, 'sadness_frame_count': 4})
+        self.assertEqual(statistics[0]['happy_frame_count'], 0)
+
+    def set_emotion_predictions(self):
+        # Rostros de brillos distintos para que los umbrales de cada emoción separen casos
+        self.happy_model.predict.side_effect = lambda batch: batch.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.angry_model.predict.side_effect = lambda batch: 1 - batch.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.sad_model.predict.side_effect = lambda batch: batch.mean(axis=(1, 2, 3)).reshape(-1, 1) + 0.05
+        return np.linspace(0, 1, 12).reshape(-1, 1, 1, 1) * np.ones((12, 48, 48, 1))
+
+    @override_settings(EMOTION_FUSED_RUNTIME=True)
+    def test_fused_emotion_runtime_matches_separate_models(self):
+        faces = self.set_emotion_predictions()
+        with override_settings(EMOTION_FUSED_RUNTIME=False):
+            separate = EmotionRuntime(self.happy_model, self.angry_model, self.sad_model)
+        expected = [predictions > threshold for predictions, threshold in zip(separate.predict(faces), [0.7, 0.7, 0.8])]
+
+        fused_model = MagicMock()
+        fused_model.predict.side_effect = lambda batch: [model.predict(batch) for model in [self.happy_model, self.angry_model, self.sad_model]]
+        with patch('movies.utils.fuse_emotion_models', return_value=fused_model) as mock_fuse_emotion_models:
+            fused = EmotionRuntime(self.happy_model, self.angry_model, self.sad_model)
+            flags = [predictions > threshold for predictions, threshold in zip(fused.predict(faces), [0.7, 0.7, 0.8])]
+
+        mock_fuse_emotion_models.assert_called_once()
+        self.assertEqual(fused_model.predict.call_count, 1)
+        for fused_flags, expected_flags in zip(flags, expected):
+            np.testing.assert_array_equal(fused_flags, expected_flags)
+
+    @override_settings(EMOTION_FUSED_RUNTIME=True)
+    def test_emotion_runtime_falls_back_to_separate_models(self):
+        faces = self.set_emotion_predictions()
+        with patch('movies.utils.fuse_emotion_models', side_effect=ValueError('incompatible models')):
+            runtime = EmotionRuntime(self.happy_model, self.angry_model, self.sad_model)
+        happy, angry, sad = runtime.predict(faces)
+
+        self.assertIsNone(runtime.fused)
+        self.assertEqual(happy.shape, (12,))
+        self.assertEqual(self.sad_model.predict.call_count, 1)
+
+    @skipUnless(importlib.util.find_spec('tensorflow'), 'tensorflow is not installed')
+    def test_fused_keras_graph_matches_separate_models(self):
+        from tensorflow import keras
+        faces = self.set_emotion_predictions().astype(np.float32)
+        models = []
+        for seed in range(3):
+            keras.utils.set_random_seed(seed)
+            models.append(keras.Sequential([keras.Input(shape=(48, 48, 1)), keras.layers.Flatten(), keras.layers.Dense(1, activation='sigmoid')]))
+
+        with override_settings(EMOTION_FUSED_RUNTIME=True):
+            fused = EmotionRuntime(*models)
+        with override_settings(EMOTION_FUSED_RUNTIME=False):
+            separate = EmotionRuntime(*models)
+
+        self.assertIsNotNone(fused.fused)
+        for fused_predictions, separate_predictions, threshold in zip(fused.predict(faces), separate.predict(faces), [0.7, 0.7, 0.8]):
+            np.testing.assert_allclose(fused_predictions, separate_predictions, rtol=1e-5)
+            np.testing.assert_array_equal(fused_predictions > threshold, separate_predictions > threshold)
+
+    @override_settings(EMOTION_FUSED_RUNTIME=True)
+    @patch('movies.utils.fuse_emotion_models', return_value=MagicMock())
+    def test_fused_runtime_is_built_once_per_model_version(self, mock_fuse_emotion_models):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(model_registry.clear)
+        paths = [os.path.join(directory.name, f'{emotion}_detection.joblib') for emotion in ('happy', 'sad', 'angry')]
+        for path in paths:
+            joblib.dump({'emotion': os.path.basename(path)}, path)
+
+        runtime = load_emotion_runtime(*paths)
+        self.assertIs(load_emotion_runtime(*paths), runtime)
+        mock_fuse_emotion_models.assert_called_once()
+        self.assertEqual([model['emotion'] for model in mock_fuse_emotion_models.call_args.args[0]], ['happy_detection.joblib', 'angry_detection.joblib', 'sad_detection.joblib'])
+
+        # Un modelo de emociones nuevo obliga a reconstruir el grafo
+        joblib.dump({'emotion': 'retrained'}, paths[1])
+        os.utime(paths[1], ns=(2_000_000_000, 2_000_000_000))
+        self.assertIsNot(load_emotion_runtime(*paths), runtime)
+        self.assertEqual(mock_fuse_emotion_models.call_count, 2)
+
+    def test_forward_is_serialized_per_net(self):
+        net = MagicMock()
+        running = []
+
+        def forward(output_layers):
+            running.append(1)
+            overlapped = len(running) > 1
+            time.sleep(0.01)
+            running.pop()
+            self.assertFalse(overlapped)
+            return []
+
+        net.forward.side_effect = forward
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: detect_faces(np.zeros((32, 32, 3), dtype=np.uint8), net, ['layer1']), range(8)))
+        self.assertEqual(net.forward.call_count, 8)
+
+class FaceDetectionCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.frames_dir = os.path.join(self.directory.name, 'frames')
+        os.makedirs(self.frames_dir)
+        # El frame 0 tiene un rostro, el 1 ninguno y el 2 es un duplicado exacto del 0
+        images = [np.full((100, 200, 3), 200, dtype=np.uint8), np.zeros((100, 200, 3), dtype=np.uint8)]
+        for index, image in enumerate(images + images[:1]):
+            cv2.imwrite(os.path.join(self.frames_dir, f'frame{index}.png'), image)
+        self.frame_files = sorted(os.listdir(self.frames_dir))
+        self.cache_path = os.path.join(self.directory.name, 'cache', 'movie.npz')
+
+        self.models = [MagicMock() for _ in range(4)]
+        for model in self.models:
+            model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.9)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def detect(self, images, *args, **kwargs):
+        return [[([10, 10, 50, 50], 0.95)] if image.mean() > 0 else [] for image in images]
+
+    def run_statistics(self, version):
+        cache = FaceDetectionCache(self.cache_path, version)
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect) as mock_detect_faces_batch:
+            statistics = calculate_frame_statistics(self.frame_files, self.frames_dir, *self.models, MagicMock(), ['layer1'], batch_size=8, face_cache=cache)
+        return statistics, mock_detect_faces_batch, cache
+
+    @override_settings(EMOTION_FUSED_RUNTIME=False)
+    def test_detections_are_reused_across_actors(self):
+        statistics, mock_detect_faces_batch, cache = self.run_statistics('v1')
+        # El duplicado comparte hash con el frame 0 pero en la primera pasada aún no está guardado
+        self.assertEqual(len(mock_detect_faces_batch.call_args.args[0]), 3)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        with patch('cv2.imdecode', wraps=cv2.imdecode) as mock_imdecode:
+            cached_statistics, mock_detect_faces_batch, cache = self.run_statistics('v1')
+        mock_detect_faces_batch.assert_called_once_with([], ANY, ANY, 0.7)
+        # Solo se decodifican los frames con rostros para recortarlos
+        self.assertEqual(mock_imdecode.call_count, 2)
+        self.assertEqual((cache.hits, cache.misses), (3, 0))
+        self.assertEqual(cached_statistics, statistics)
+        self.assertEqual(statistics['actor_frame_count'], 2)
+
+    @override_settings(EMOTION_FUSED_RUNTIME=False)
+    def test_other_detector_version_invalidates_the_cache(self):
+        self.run_statistics('v1')
+        statistics, mock_detect_faces_batch, cache = self.run_statistics('v2')
+        self.assertEqual(len(mock_detect_faces_batch.call_args.args[0]), 3)
+        self.assertEqual(cache.hits, 0)
+
+        # El archivo se reescribe con la nueva versión y guarda cajas y confianzas exactas
+        reloaded = FaceDetectionCache(self.cache_path, 'v2')
+        self.assertEqual(sorted(map(str, reloaded.faces.values())), sorted(map(str, cache.faces.values())))
+        self.assertIn([([10, 10, 50, 50], 0.95)], list(reloaded.faces.values()))
+
+class FrameDirectoryTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.frames_dir = os.path.join(self.directory.name, 'frames')
+        os.makedirs(self.frames_dir)
+        for index, value in enumerate([200, 0, 220, 0, 240, 180]):
+            self.write_frame(f'frame{index}.png', value)
+        self.ledger_path = os.path.join(self.directory.name, 'ledger', 'actor.npz')
+
+        # El actor aparece en los frames claros y los modelos de emociones puntúan por el brillo
+        self.actor_model = MagicMock()
+        self.actor_model.predict.side_effect = lambda faces: np.full((len(faces), 1), 0.9)
+        self.happy_model = MagicMock()
+        self.happy_model.predict.side_effect = lambda faces: faces.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.sad_model = MagicMock()
+        self.sad_model.predict.side_effect = lambda faces: 1 - faces.mean(axis=(1, 2, 3)).reshape(-1, 1)
+        self.angry_model = MagicMock()
+        self.angry_model.predict.side_effect = lambda faces: np.zeros((len(faces), 1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_frame(self, name, value):
+        path = os.path.join(self.frames_dir, name)
+        cv2.imwrite(path, np.full((100, 100, 3), value, dtype=np.uint8))
+        # Cambia la fecha aunque el archivo se reescriba dentro del mismo instante
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def detect(self, images, *args, **kwargs):
+        return [[([0, 0, 100, 100], 0.95)] if image.mean() > 0 else [] for image in images]
+
+    def run_statistics(self, version='v1', progress=None):
+        frame_files = sorted(os.listdir(self.frames_dir))
+        ledger = FrameLedger(self.ledger_path, version) if version else None
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect) as mock_detect_faces_batch:
+            statistics = calculate_frame_statistics(frame_files, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'], progress=progress, batch_size=2, ledger=ledger)
+        detected = sum(len(call.args[0]) for call in mock_detect_faces_batch.call_args_list)
+        return statistics, detected
+
+@override_settings(EMOTION_FUSED_RUNTIME=False)
+class FrameLedgerTest(FrameDirectoryTestCase):
+
+    def test_only_new_and_changed_frames_are_analysed(self):
+        statistics, detected = self.run_statistics()
+        self.assertEqual(detected, 6)
+        self.assertEqual(statistics, self.run_statistics(version=None)[0])
+
+        self.write_frame('frame1.png', 250)
+        self.write_frame('frame6.png', 230)
+        os.remove(os.path.join(self.frames_dir, 'frame5.png'))
+        statistics, detected = self.run_statistics()
+
+        # Solo se analizan el frame modificado y el nuevo, y el resultado cuadra con una pasada completa
+        self.assertEqual(detected, 2)
+        self.assertEqual(statistics, self.run_statistics(version=None)[0])
+        self.assertEqual(statistics['total_frames'], 6)
+        self.assertEqual(statistics['actor_frame_count'], 5)
+
+    def test_interrupted_run_resumes_where_it_stopped(self):
+        def interrupt(processed_frames, total_frames):
+            if processed_frames == 4:
+                raise KeyboardInterrupt
+
+        with patch('movies.frame_ledger.LEDGER_SAVE_INTERVAL', 0), self.assertRaises(KeyboardInterrupt):
+            self.run_statistics(progress=interrupt)
+
+        statistics, detected = self.run_statistics()
+        self.assertEqual(detected, 2)
+        self.assertEqual(statistics, self.run_statistics(version=None)[0])
+
+    def test_other_model_version_reanalyses_every_frame(self):
+        self.run_statistics()
+        statistics, detected = self.run_statistics(version='v2')
+        self.assertEqual(detected, 6)
+        self.assertEqual(len(FrameLedger(self.ledger_path, 'v2').entries), 6)
+        self.assertEqual(FrameLedger(self.ledger_path, 'v1').entries, {})
+
+@override_settings(EMOTION_FUSED_RUNTIME=False, FACE_SCORE_FLOOR=0.3)
+class FaceScoreStoreTest(FrameDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store_path = os.path.join(self.directory.name, 'scores', 'actor.npz')
+        # El actor solo se reconoce con seguridad en los frames más claros
+        self.actor_model.predict.side_effect = lambda faces: faces.mean(axis=(1, 2, 3)).reshape(-1, 1)
+
+    def run_with_store(self, ledger=False):
+        frame_files = sorted(os.listdir(self.frames_dir))
+        store = FaceScoreStore(self.store_path, 'v1', 0.3)
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect):
+            statistics = calculate_frame_statistics(
+                frame_files, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'],
+                batch_size=2, ledger=FrameLedger(self.ledger_path, 'v1') if ledger else None, score_store=store
+            )
+        return statistics, FaceScoreStore(self.store_path)
+
+    def test_stored_scores_reproduce_the_analysis(self):
+        statistics, store = self.run_with_store()
+        self.assertEqual({'total_frames': len(store.names), **count_frame_flags(store.flags())}, statistics)
+
+    def test_new_thresholds_match_a_full_reanalysis(self):
+        statistics, store = self.run_with_store()
+        thresholds = {'actor': 0.75, 'happy': 0.9, 'angry': 0.2, 'sadness': 0.1}
+        with patch.dict(FRAME_THRESHOLDS, thresholds):
+            reanalysed = self.run_statistics(version=None)[0]
+
+        self.assertNotEqual(reanalysed, statistics)
+        self.assertEqual({'total_frames': len(store.names), **count_frame_flags(store.flags(thresholds))}, reanalysed)
+
+    def test_incremental_runs_replace_the_scores_of_changed_frames(self):
+        self.run_with_store(ledger=True)
+        self.write_frame('frame1.png', 250)
+        os.remove(os.path.join(self.frames_dir, 'frame5.png'))
+        statistics, store = self.run_with_store(ledger=True)
+
+        self.assertEqual(sorted(store.names), sorted(os.listdir(self.frames_dir)))
+        self.assertEqual({'total_frames': len(store.names), **count_frame_flags(store.flags())}, statistics)
+        self.assertEqual(statistics, self.run_statistics(version=None)[0])
+
+    def test_frames_missing_from_the_store_are_rescored_even_with_a_current_ledger(self):
+        # El registro se escribió antes de activar el almacén de puntuaciones
+        statistics, detected = self.run_statistics()
+        self.assertEqual(detected, 6)
+
+        rescored, store = self.run_with_store(ledger=True)
+        self.assertEqual(sorted(store.names), sorted(os.listdir(self.frames_dir)))
+        self.assertEqual({'total_frames': len(store.names), **count_frame_flags(store.flags())}, rescored)
+
+class FramePipelineTest(FrameDirectoryTestCase):
+
+    def test_prefetch_keeps_order_and_bounds_the_frames_in_memory(self):
+        lock = threading.Lock()
+        loaded = []
+
+        def load(item):
+            time.sleep(0.001 * (item % 3))
+            with lock:
+                loaded.append(item)
+            return item
+
+        consumed = []
+        for item in prefetch(range(40), load, workers=4, depth=5):
+            # Nunca hay más de depth frames leídos por delante del consumidor
+            with lock:
+                self.assertLessEqual(len(loaded) - len(consumed), 5)
+            consumed.append(item)
+        self.assertEqual(consumed, list(range(40)))
+        self.assertEqual(list(prefetch(range(5), load, workers=0, depth=5)), list(range(5)))
+
+    def test_background_reader_keeps_order_and_raises_errors(self):
+        def frames():
+            yield from range(10)
+            raise ValueError('corrupt video')
+
+        items = background(frames(), depth=2)
+        self.assertEqual([next(items) for _ in range(10)], list(range(10)))
+        with self.assertRaises(ValueError):
+            next(items)
+
+    @override_settings(EMOTION_FUSED_RUNTIME=False, FRAME_DECODE_WORKERS=3, FRAME_PREFETCH_DEPTH=4)
+    def test_threaded_decode_matches_sequential_decode_and_reports_stages(self):
+        timings = StageTimings()
+        frame_files = sorted(os.listdir(self.frames_dir))
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect):
+            statistics = calculate_frame_statistics(frame_files, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'], batch_size=2, timings=timings)
+        with override_settings(FRAME_DECODE_WORKERS=0):
+            sequential = self.run_statistics(version=None)[0]
+
+        self.assertEqual(statistics, sequential)
+        self.assertEqual(timings.frames, 6)
+        self.assertEqual(set(timings.seconds), {'decode', 'wait', 'detect', 'classify'})
+        self.assertIn('ms/frame', timings.summary())
+
+@override_settings(FRAME_REDUCED_DECODE=True, FRAME_REDUCED_DECODE_MIN_SIZE=416, FRAME_DECODE_WORKERS=0)
+class ReducedDecodeTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # Frame 4K con un rostro claro y un frame sin rostros
+        image = np.zeros((1664, 1664, 3), dtype=np.uint8)
+        image[400:800, 400:800] = 255
+        cv2.imwrite(os.path.join(self.directory.name, 'face.jpg'), image)
+        cv2.imwrite(os.path.join(self.directory.name, 'empty.jpg'), np.zeros((1664, 1664, 3), dtype=np.uint8))
+        self.frame_files = ['empty.jpg', 'face.jpg']
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def detect(self, images, *args, **kwargs):
+        # La red recibe el frame reducido a un cuarto; las cajas salen en sus coordenadas
+        self.detected_shapes = [image.shape for image in images]
+        return [[([100, 100, 100, 100], 0.9)] if image.max() > 0 else [] for image in images]
+
+    def test_reduction_factor(self):
+        for size, factor in [((1280, 720), 1), ((1920, 1080), 2), ((3840, 2160), 4), ((8000, 4000), 8)]:
+            path = os.path.join(self.directory.name, 'size.jpg')
+            Image.new('RGB', size).save(path)
+            self.assertEqual(reduction_factor(path), factor)
+        with override_settings(FRAME_REDUCED_DECODE=False):
+            self.assertEqual(reduction_factor(path), 1)
+        self.assertEqual(reduction_factor(__file__), 1)
+
+    def test_detection_runs_on_reduced_frames_and_crops_at_full_resolution(self):
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect), patch('cv2.imread', wraps=cv2.imread) as mock_imread:
+            frames = next(detect_frame_batches(self.frame_files, self.directory.name, MagicMock(), ['layer1'], batch_size=2))
+
+        self.assertEqual(self.detected_shapes, [(416, 416, 3), (416, 416, 3)])
+        # Solo el frame con rostro se vuelve a leer a resolución completa
+        self.assertEqual(mock_imread.call_count, 3)
+        (empty_image, empty_faces), (face_image, faces) = frames
+        self.assertEqual(empty_faces, [])
+        self.assertEqual(face_image.shape, (1664, 1664, 3))
+        self.assertEqual(faces, [([400, 400, 400, 400], 0.9)])
+
+    def test_cached_detections_are_stored_at_full_resolution(self):
+        cache = FaceDetectionCache(os.path.join(self.directory.name, 'cache.npz'), 'v1')
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect):
+            frames = next(cached_frame_batches(self.frame_files, self.directory.name, MagicMock(), ['layer1'], 2, cache))
+
+        self.assertEqual(self.detected_shapes, [(416, 416, 3), (416, 416, 3)])
+        self.assertEqual(frames[1][0].shape, (1664, 1664, 3))
+        self.assertIn([([400, 400, 400, 400], 0.9)], list(cache.faces.values()))
+
+    @override_settings(FRAME_DECODE_WORKERS=2)
+    def test_identical_frames_read_ahead_are_cropped_at_full_resolution(self):
+        for name in ['copy1.jpg', 'copy2.jpg']:
+            shutil.copy(os.path.join(self.directory.name, 'face.jpg'), os.path.join(self.directory.name, name))
+        cache = FaceDetectionCache(os.path.join(self.directory.name, 'cache.npz'), 'v1')
+        loaded = threading.Semaphore(0)
+
+        def count_loads(source):
+            loaded.release()
+            return reduction_factor(source)
+
+        def detect_after_loads(images, *args, **kwargs):
+            # Las copias ya se han leído reducidas antes de que la primera detección llegue a la caché
+            for _ in range(3 if images else 0):
+                loaded.acquire(timeout=5)
+            return self.detect(images)
+
+        with patch('movies.utils.reduction_factor', side_effect=count_loads), patch('movies.utils.detect_faces_batch', side_effect=detect_after_loads) as mock_detect_faces_batch:
+            frames = [frame for batch in cached_frame_batches(['face.jpg', 'copy1.jpg', 'copy2.jpg'], self.directory.name, MagicMock(), ['layer1'], 1, cache) for frame in batch]
+
+        self.assertEqual(sum(len(call.args[0]) for call in mock_detect_faces_batch.call_args_list), 1)
+        for image, faces in frames:
+            self.assertEqual(image.shape, (1664, 1664, 3))
+            self.assertEqual(face_crops([(image, faces)])[0][1].shape, (400, 400, 3))
+
+@override_settings(EMOTION_FUSED_RUNTIME=False)
+class VideoIngestionTest(FrameDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Vídeo de 40 frames a 10 fps en el que el brillo cambia cada 3 frames
+        self.video_path = os.path.join(self.directory.name, 'test_movie.avi')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (100, 100))
+        for index in range(40):
+            writer.write(np.full((100, 100, 3), [0, 120, 200, 250][(index // 3) % 4], dtype=np.uint8))
+        writer.release()
+
+    def analyse_video(self, frame_names, ledger=None):
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect) as mock_detect_faces_batch:
+            statistics = calculate_frame_statistics(frame_names, None, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'], batch_size=3, ledger=ledger, video_path=self.video_path)
+        return statistics, sum(len(call.args[0]) for call in mock_detect_faces_batch.call_args_list)
+
+    def test_sampled_video_frames_match_extracted_frames(self):
+        frame_names = video_frame_names(self.video_path, 2)
+        self.assertEqual(frame_names, [f'{index:08d}' for index in range(0, 40, 5)])
+        statistics, detected = self.analyse_video(frame_names)
+
+        # Los mismos frames volcados a disco dan el mismo resultado
+        capture = cv2.VideoCapture(self.video_path)
+        frames_dir = os.path.join(self.directory.name, 'extracted')
+        os.makedirs(frames_dir)
+        for index in range(40):
+            ok, image = capture.read()
+            if f'{index:08d}' in frame_names:
+                cv2.imwrite(os.path.join(frames_dir, f'{index:08d}.png'), image)
+        capture.release()
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect):
+            extracted = calculate_frame_statistics(sorted(os.listdir(frames_dir)), frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'], batch_size=3)
+
+        self.assertEqual(detected, 8)
+        self.assertEqual(statistics, extracted)
+        self.assertEqual(statistics['total_frames'], 8)
+
+    def test_video_frames_are_recorded_in_the_ledger(self):
+        frame_names = video_frame_names(self.video_path, 2)
+        statistics, detected = self.analyse_video(frame_names, FrameLedger(self.ledger_path, 'v1'))
+        cached_statistics, detected = self.analyse_video(frame_names, FrameLedger(self.ledger_path, 'v1'))
+        self.assertEqual(detected, 0)
+        self.assertEqual(cached_statistics, statistics)
+
+    def test_movie_frames_prefer_the_video(self):
+        movie = MagicMock(title='Test Movie')
+        with override_settings(MOVIE_VIDEOS_DIR=self.directory.name, VIDEO_SAMPLE_RATE=1):
+            frames_dir, frame_names, video_path = movie_frames(movie)
+            self.assertEqual((video_path, len(frame_names)), (self.video_path, 4))
+            with override_settings(VIDEO_INGESTION=False):
+                self.assertIsNone(movie_frames(movie)[2])
+
+@override_settings(EMOTION_FUSED_RUNTIME=False, FRAME_DECODE_WORKERS=0)
+class FrameDeduplicationTest(FrameDirectoryTestCase):
+
+    def test_deduplicator_compares_with_the_last_kept_frame(self):
+        rng = np.random.default_rng(0)
+        scene = rng.integers(0, 255, (72, 128, 3), dtype=np.uint8)
+        noisy = np.clip(scene.astype(int) + rng.integers(-2, 3, scene.shape), 0, 255).astype(np.uint8)
+        deduplicator = FrameDeduplicator(max_distance=4)
+
+        self.assertFalse(deduplicator.is_duplicate(scene))
+        self.assertTrue(deduplicator.is_duplicate(noisy))
+        self.assertFalse(deduplicator.is_duplicate(scene[:, ::-1].copy()))
+        # Un frame sin imagen corta la secuencia aunque el siguiente sea igual
+        self.assertFalse(deduplicator.is_duplicate(None))
+        self.assertFalse(deduplicator.is_duplicate(scene[:, ::-1].copy()))
+        self.assertEqual((deduplicator.kept, deduplicator.duplicates), (3, 1))
+
+    def test_duplicates_count_as_the_frame_they_repeat(self):
+        self.write_frame('frame0a.png', 200)
+        self.write_frame('frame4a.png', 240)
+        frame_files = sorted(os.listdir(self.frames_dir))
+        store = FaceScoreStore(os.path.join(self.directory.name, 'scores.npz'), 'v1', 0.5)
+
+        with patch('movies.utils.detect_faces_batch', side_effect=self.detect) as mock_detect_faces_batch:
+            statistics = calculate_frame_statistics(frame_files, self.frames_dir, self.actor_model, self.happy_model, self.sad_model, self.angry_model, MagicMock(), ['layer1'], batch_size=3, score_store=store, deduplicator=FrameDeduplicator(4))
+        detected = sum(len(call.args[0]) for call in mock_detect_faces_batch.call_args_list)
+
+        # Las dos copias no pasan por la red, pero los recuentos son los de la pasada completa
+        self.assertEqual(detected, 6)
+        self.assertEqual(statistics, self.run_statistics(version=None)[0])
+        self.assertEqual(statistics['actor_frame_count'], 6)
+        store = FaceScoreStore(store.path)
+        self.assertEqual({'total_frames': len(store.names), **count_frame_flags(store.flags())}, statistics)
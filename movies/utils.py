@@ -1,9 +1,18 @@
 from django.conf import settings
+import io
+import itertools
 import os
+import threading
 import cv2
 import joblib
 import numpy as np
+from PIL import Image
 from slugify import slugify
+from ai_models.registry import model_registry, actor_model_registry
+from .face_cache import frame_hash
+from .pipeline import StageTimings, background, prefetch
+from .frame_ledger import count_frame_flags, frame_stamp
+from .score_store import FRAME_THRESHOLDS, frame_flags
 from .models import Emotion, Analysis
 
 def delete_images(image_path):
@@ -17,15 +26,22 @@ def check_files_exist(files):
             raise FileNotFoundError(f"File not found: {file}")
 
 def load_joblib(path):
-    return joblib.load(path)
+    # Una sola carga por proceso mientras el archivo no cambie
+    return model_registry.get(path, [path], lambda: joblib.load(path))
 
-def load_yolo_model(cfg_name, weights_name, names_name):
-    resources_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources')
-    yolo_path = os.path.join(resources_path, 'yolo')
-    cfg_path = os.path.join(yolo_path, cfg_name)
-    weights_path = os.path.join(yolo_path, weights_name)
-    names_path = os.path.join(yolo_path, names_name)
+def load_actor_model(path):
+    # Hay un modelo por actor: se guardan en una caché LRU con presupuesto de memoria
+    return actor_model_registry.get(path, [path], lambda: joblib.load(path))
+
+# Las redes de cv2.dnn no admiten dos forward() a la vez; la misma red se comparte entre hilos a través del registro
+_net_locks = {}
+_net_locks_lock = threading.Lock()
 
+def net_lock(net):
+    with _net_locks_lock:
+        return _net_locks.setdefault(id(net), threading.Lock())
+
+def read_yolo_model(cfg_path, weights_path, names_path):
     net = cv2.dnn.readNet(weights_path, cfg_path)
     with open(names_path, 'r') as f:
         classes = [line.strip() for line in f.readlines()]
@@ -34,84 +50,449 @@ def load_yolo_model(cfg_name, weights_name, names_name):
     output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers()]
     return net, classes, output_layers
 
-def detect_faces(image, net, output_layers, threshold=0.7):
-    height, width = image.shape[:2]
-    blob = cv2.dnn.blobFromImage(image, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-    net.setInput(blob)
-    outs = net.forward(output_layers)
+def load_yolo_model(cfg_name, weights_name, names_name):
+    resources_path = os.path.join(settings.BASE_DIR, 'ai_models', 'resources')
+    yolo_path = os.path.join(resources_path, 'yolo')
+    cfg_path = os.path.join(yolo_path, cfg_name)
+    weights_path = os.path.join(yolo_path, weights_name)
+    names_path = os.path.join(yolo_path, names_name)
 
-    boxes = []
-    confidences = []
+    paths = [cfg_path, weights_path, names_path]
+    return model_registry.get(weights_path, paths, lambda: read_yolo_model(*paths))
 
-    for out in outs:
-        for detection in out:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            if confidence > threshold:
-                center_x = int(detection[0] * width)
-                center_y = int(detection[1] * height)
-                w = int(detection[2] * width)
-                h = int(detection[3] * height)
-                x = int(center_x - w / 2)
-                y = int(center_y - h / 2)
-                boxes.append([x, y, w, h])
-                confidences.append(float(confidence))
+def decode_detections(outs, width, height, threshold):
+    # Todas las filas de todas las capas de salida se procesan como un único array
+    detections = np.concatenate([np.reshape(out, (-1, np.shape(out)[-1])) for out in outs]) if len(outs) else np.empty((0, 6))
+    scores = detections[:, 5:]
+    confidences = scores[np.arange(len(scores)), np.argmax(scores, axis=1)]
+    mask = confidences > threshold
+    detections = detections[mask]
+    confidences = confidences[mask]
+
+    center_x = (detections[:, 0] * width).astype(int)
+    center_y = (detections[:, 1] * height).astype(int)
+    w = (detections[:, 2] * width).astype(int)
+    h = (detections[:, 3] * height).astype(int)
+    x = (center_x - w / 2).astype(int)
+    y = (center_y - h / 2).astype(int)
+
+    boxes = np.stack([x, y, w, h], axis=1).tolist()
+    confidences = confidences.tolist()
 
     indices = cv2.dnn.NMSBoxes(boxes, confidences, threshold, 0.4)
     faces = [(boxes[i], confidences[i]) for i in indices]
     return faces
 
-def calculate_frame_statistics(frame_files, frames_dir, actor_model, happy_model, sad_model, angry_model, face_net, face_output_layers):
-    actor_threshold = 0.7; actor_frame_count = 0
-    happy_threshold = 0.7; happy_frame_count = 0
-    angry_threshold = 0.7; angry_frame_count = 0
-    sadness_threshold = 0.8; sadness_frame_count = 0
+def detect_faces(image, net, output_layers, threshold=0.7):
+    height, width = image.shape[:2]
+    blob = cv2.dnn.blobFromImage(image, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+    with net_lock(net):
+        net.setInput(blob)
+        outs = net.forward(output_layers)
+    return decode_detections(outs, width, height, threshold)
+
+def split_batch_outputs(outs, batch_size):
+    # Según la versión de OpenCV cada capa devuelve (N, filas, columnas) o las N imágenes apiladas en 2D
+    frame_outs = [[] for _ in range(batch_size)]
+    for out in outs:
+        parts = list(out) if out.ndim == 3 else np.split(out, batch_size)
+        for index, part in enumerate(parts):
+            frame_outs[index].append(part)
+    return frame_outs
 
-    for index, frame_file in enumerate(frame_files):  # Para cada frame
-        frame_path = os.path.join(frames_dir, frame_file)
-        image = cv2.imread(frame_path)
+def detect_faces_batch(images, net, output_layers, threshold=0.7):
+    if not images:
+        return []
 
-        faces = detect_faces(image, face_net, face_output_layers, threshold=0.7)
-        actor_prediction = None
-        happy_prediction = None
-        angry_prediction = None
-        sad_prediction = None
+    # Una única pasada de la red para todo el lote; las cajas se escalan al tamaño de cada frame
+    blob = cv2.dnn.blobFromImages(images, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+    with net_lock(net):
+        net.setInput(blob)
+        outs = net.forward(output_layers)
+    return [
+        decode_detections(frame_outs, image.shape[1], image.shape[0], threshold)
+        for image, frame_outs in zip(images, split_batch_outputs(outs, len(images)))
+    ]
 
-        for (box, confidence) in faces:  # Para cada rostro en el frame 
-            x, y, w, h = box
-            face = image[y:y + h, x:x + w]
-            processed_face = preprocess_face_for_actor_model(face)
+# Decodificación reducida de OpenCV: en JPEG escala en la DCT sin llegar a decodificar la imagen completa
+REDUCED_DECODE_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def reduction_factor(source):
+    if not settings.FRAME_REDUCED_DECODE:
+        return 1
+    # Solo se lee la cabecera; si no es una imagen válida se decodifica como siempre
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+    except (OSError, ValueError):
+        return 1
+    for factor in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+        if min(width, height) / factor >= settings.FRAME_REDUCED_DECODE_MIN_SIZE:
+            return factor
+    return 1
+
+def scale_faces(faces, factor):
+    if factor == 1:
+        return faces
+    return [([value * factor for value in box], confidence) for box, confidence in faces]
+
+def frame_fingerprint(image):
+    # Se muestrea una rejilla de 72x64 píxeles antes de promediar: reducir el frame entero cuesta cien veces más
+    grid = cv2.resize(image, (72, 64), interpolation=cv2.INTER_NEAREST)
+    small = cv2.cvtColor(cv2.resize(grid, (9, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY).astype(np.int16)
+    return (small[:, 1:] > small[:, :-1], small.mean())
+
+class FrameDeduplicator:
+    # Huella de diferencias (dHash) de 64 bits y brillo medio; se compara siempre con el último frame conservado
+    def __init__(self, max_distance, max_brightness_change=8.0):
+        self.max_distance = max_distance
+        self.max_brightness_change = max_brightness_change
+        self.last = None
+        self.kept = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, image):
+        # Un frame sin imagen (sin rostros en la caché o ilegible) corta la secuencia
+        return self.is_repeated(frame_fingerprint(image) if image is not None else None)
+
+    def is_repeated(self, fingerprint):
+        if fingerprint is None:
+            self.last = None
+            return False
+        if self.last is not None:
+            distance = np.count_nonzero(fingerprint[0] != self.last[0])
+            if distance <= self.max_distance and abs(fingerprint[1] - self.last[1]) <= self.max_brightness_change:
+                self.duplicates += 1
+                return True
+        self.last = fingerprint
+        self.kept += 1
+        return False
+
+def mark_duplicates(images, deduplicator, timings):
+    if deduplicator is None:
+        return [False] * len(images)
+    with timings.measure('dedup'):
+        return [deduplicator.is_duplicate(image) for image in images]
 
-            # Hacer la predicción usando el modelo de detección de actores
-            actor_prediction = actor_model.predict(processed_face)
+def prefetched_batches(frame_files, load, batch_size, timings):
+    # Los hilos leen y decodifican por delante; la red solo se usa desde el hilo que consume los lotes
+    frames = prefetch(frame_files, timings.timed('decode', load), settings.FRAME_DECODE_WORKERS, settings.FRAME_PREFETCH_DEPTH, timings)
+    while True:
+        batch = list(itertools.islice(frames, batch_size))
+        if not batch:
+            return
+        yield batch
 
-            if actor_prediction > actor_threshold:  # Si el rostro es del actor
-                actor_frame_count += 1
+def detect_frame_batches(frame_files, frames_dir, net, output_layers, batch_size, threshold=0.7, timings=None, deduplicator=None):
+    timings = timings or StageTimings()
 
-                processed_face = preprocess_face_for_emotion_model(face)
-                happy_prediction = happy_model.predict(processed_face)
-                angry_prediction = angry_model.predict(processed_face)
-                sad_prediction = sad_model.predict(processed_face)
+    def load(frame_file):
+        path = os.path.join(frames_dir, frame_file)
+        factor = reduction_factor(path)
+        image = cv2.imread(path, REDUCED_DECODE_FLAGS[factor]) if factor > 1 else cv2.imread(path)
+        return path, image, factor
 
-                if happy_prediction > happy_threshold:
-                    happy_frame_count += 1
-                if angry_prediction > angry_threshold:
-                    angry_frame_count += 1
-                if sad_prediction > sadness_threshold:
-                    sadness_frame_count += 1
+    for loaded in prefetched_batches(frame_files, load, batch_size, timings):
+        duplicates = mark_duplicates([image for path, image, factor in loaded], deduplicator, timings)
+        images = [image for (path, image, factor), duplicate in zip(loaded, duplicates) if image is not None and not duplicate]
+        # Los archivos que no son imágenes cuentan como frames sin rostros
+        with timings.measure('detect'):
+            detections = iter(detect_faces_batch(images, net, output_layers, threshold))
 
+        frames = []
+        for (path, image, factor), duplicate in zip(loaded, duplicates):
+            # Un frame casi idéntico al anterior no se analiza: se marca sin imagen ni rostros
+            if duplicate:
+                frames.append((None, None))
+                continue
+            faces = scale_faces(next(detections), factor) if image is not None else []
+            # Los rostros se recortan del frame a resolución completa, que solo se lee si hay alguno
+            if faces and factor > 1:
+                with timings.measure('decode'):
+                    image = cv2.imread(path)
+            frames.append((image, faces))
+        yield frames
+
+def cached_frame_batches(frame_files, frames_dir, net, output_layers, batch_size, cache, threshold=0.7, timings=None, deduplicator=None):
+    timings = timings or StageTimings()
+
+    def load(frame_file):
+        with open(os.path.join(frames_dir, frame_file), 'rb') as f:
+            data = f.read()
+        key = frame_hash(data)
+        buffer = np.frombuffer(data, np.uint8)
+        faces = cache.faces.get(key)
+        # Solo se decodifica el frame si hay que detectar (a resolución reducida) o recortar rostros (a resolución completa)
+        if faces is None:
+            factor = reduction_factor(io.BytesIO(data))
+            image = cv2.imdecode(buffer, REDUCED_DECODE_FLAGS[factor]) if factor > 1 else cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        else:
+            factor = 1
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if faces else None
+        return key, buffer, image, factor
+
+    for loaded in prefetched_batches(frame_files, load, batch_size, timings):
+        duplicates = mark_duplicates([image for key, buffer, image, factor in loaded], deduplicator, timings)
+        frames = []
+        pending = []
+        for (key, buffer, image, factor), duplicate in zip(loaded, duplicates):
+            if duplicate:
+                frames.append([None, None])
+                continue
+            faces = cache.get(key)
+            if faces and factor > 1:
+                # Un frame idéntico de un lote anterior se detectó mientras este se leía reducido por delante
+                with timings.measure('decode'):
+                    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            if faces is None and image is not None:
+                pending.append((len(frames), key, buffer, factor))
+            elif faces is None:
+                # Los archivos que no son imágenes cuentan como frames sin rostros
+                cache.set(key, [])
+            frames.append([image, faces or []])
+
+        with timings.measure('detect'):
+            detections = detect_faces_batch([frames[index][0] for index, key, buffer, factor in pending], net, output_layers, threshold)
+        for (index, key, buffer, factor), faces in zip(pending, detections):
+            # En la caché las cajas siempre se guardan en coordenadas del frame completo
+            faces = scale_faces(faces, factor)
+            if faces and factor > 1:
+                with timings.measure('decode'):
+                    frames[index][0] = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            frames[index][1] = faces
+            cache.set(key, faces)
+        yield [tuple(frame) for frame in frames]
+
+    cache.save()
+
+def video_frame_names(video_path, sample_rate):
+    capture = cv2.VideoCapture(video_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+
+    # Un frame cada fps / sample_rate; los nombres son el índice del frame en el vídeo
+    step = max(fps / sample_rate, 1.0)
+    return [f'{int(position * step):08d}' for position in range(int(frame_count / step))]
+
+def read_video_frames(video_path, indices, skip=None, timings=None):
+    timings = timings or StageTimings()
+    wanted = iter(sorted(indices))
+    next_index = next(wanted, None)
+    capture = cv2.VideoCapture(video_path)
+    position = 0
+    try:
+        while next_index is not None:
+            # grab() avanza sin convertir el frame; solo se recuperan los de la muestra
+            with timings.measure('decode'):
+                grabbed = capture.grab()
+                image = None
+                if grabbed and position == next_index and not (skip and skip(position)):
+                    retrieved, image = capture.retrieve()
+                    image = image if retrieved else None
+            if not grabbed:
                 break
+            if position == next_index:
+                yield position, image
+                next_index = next(wanted, None)
+            position += 1
+    finally:
+        capture.release()
+
+    # Si el vídeo tiene menos frames de los anunciados, los que faltan cuentan como frames sin rostros
+    while next_index is not None:
+        yield next_index, None
+        next_index = next(wanted, None)
+
+def video_frame_batches(video_path, frame_names, net, output_layers, batch_size, cache=None, threshold=0.7, timings=None, deduplicator=None):
+    timings = timings or StageTimings()
+    # En la caché cada frame se identifica por el vídeo (nombre, fecha y tamaño) y su índice
+    video_key = f'{os.path.basename(video_path)}:{frame_stamp(video_path)}'
+    keys = {int(name): frame_hash(f'{video_key}:{name}'.encode()) for name in frame_names}
+    skip = (lambda index: cache.faces.get(keys[index]) == []) if cache is not None else None
+    frames = background(read_video_frames(video_path, keys, skip, timings), settings.FRAME_PREFETCH_DEPTH, timings)
+
+    while True:
+        loaded = list(itertools.islice(frames, batch_size))
+        if not loaded:
+            break
+        duplicates = mark_duplicates([image for index, image in loaded], deduplicator, timings)
+        batch = []
+        pending = []
+        for (index, image), duplicate in zip(loaded, duplicates):
+            if duplicate:
+                batch.append([None, None])
+                continue
+            faces = cache.get(keys[index]) if cache is not None else None
+            if faces is None and image is not None:
+                pending.append((len(batch), keys[index]))
+            elif faces is None and cache is not None:
+                cache.set(keys[index], [])
+            batch.append([image, faces or []])
+
+        with timings.measure('detect'):
+            detections = detect_faces_batch([batch[position][0] for position, key in pending], net, output_layers, threshold)
+        for (position, key), faces in zip(pending, detections):
+            batch[position][1] = faces
+            if cache is not None:
+                cache.set(key, faces)
+        yield [tuple(frame) for frame in batch]
+
+    if cache is not None:
+        cache.save()
+
+def predict_batch(model, batch):
+    # Una salida por imagen del lote, sea (N,) o (N, 1)
+    return np.asarray(model.predict(batch)).reshape(len(batch))
+
+def fuse_emotion_models(models):
+    try:
+        from tensorflow import keras
+    except ImportError:
+        return None
+    if not all(isinstance(model, keras.Model) for model in models):
+        return None
+
+    # Un solo grafo con una entrada compartida y una salida por emoción
+    inputs = keras.Input(shape=models[0].input_shape[1:])
+    return keras.Model(inputs, [model(inputs) for model in models])
+
+class EmotionRuntime:
+    def __init__(self, happy_model, angry_model, sad_model, fused=None):
+        self.models = [happy_model, angry_model, sad_model]
+        self.fused = fused
+        if self.fused is None and settings.EMOTION_FUSED_RUNTIME:
+            try:
+                self.fused = fuse_emotion_models(self.models)
+            except Exception:
+                # Si no se pueden combinar se sigue con los tres modelos por separado
+                self.fused = None
+
+    def predict(self, faces):
+        if self.fused is not None:
+            outputs = self.fused.predict(faces)
+            return [np.asarray(output).reshape(len(faces)) for output in outputs]
+        return [predict_batch(model, faces) for model in self.models]
+
+def load_emotion_runtime(happy_path, sad_path, angry_path):
+    # El grafo combinado se construye una vez por proceso y se reutiliza en todos los trabajos mientras no cambien los modelos
+    paths = [happy_path, sad_path, angry_path]
+    key = f'emotion_runtime:{"fused" if settings.EMOTION_FUSED_RUNTIME else "separate"}'
+    return model_registry.get(key, paths, lambda: EmotionRuntime(load_joblib(happy_path), load_joblib(angry_path), load_joblib(sad_path)))
+
+def face_crops(frames):
+    crops = []
+    for frame_index, (image, faces) in enumerate(frames):
+        for (box, confidence) in faces or []:
+            x, y, w, h = box
+            crops.append((frame_index, image[y:y + h, x:x + w]))
+    return crops
+
+def frame_batch_scores(frames, actor_models, emotion_runtime, emotion_floor):
+    crops = face_crops(frames)
+    face_frames = np.array([frame_index for frame_index, face in crops], dtype=np.int32)
+    actor_scores = {key: np.empty(0, dtype=np.float32) for key in actor_models}
+    emotion_scores = np.full((3, len(crops)), np.nan, dtype=np.float32)
+    if not crops:
+        return face_frames, actor_scores, emotion_scores
+
+    # Los rostros se preparan una vez y se comparan con el modelo de cada actor del reparto
+    actor_batch = np.concatenate([preprocess_face_for_actor_model(face) for frame_index, face in crops])
+    actor_scores = {key: predict_batch(actor_model, actor_batch) for key, actor_model in actor_models.items()}
+
+    # Las emociones son del rostro, no del actor: una sola pasada para los que algún actor puede reclamar
+    candidates = np.flatnonzero(np.any([scores > emotion_floor for scores in actor_scores.values()], axis=0))
+    if candidates.size:
+        emotion_batch = np.concatenate([preprocess_face_for_emotion_model(crops[index][1]) for index in candidates])
+        emotion_scores[:, candidates] = emotion_runtime.predict(emotion_batch)
+    return face_frames, actor_scores, emotion_scores
+
+def calculate_movie_statistics(frame_files, frames_dir, actor_models, happy_model, sad_model, angry_model, face_net, face_output_layers, progress=None, batch_size=None, emotion_runtime=None, face_cache=None, ledgers=None, score_stores=None, timings=None, video_path=None, deduplicator=None):
+    batch_size = batch_size or settings.FACE_DETECTION_BATCH_SIZE
+    emotion_runtime = emotion_runtime or EmotionRuntime(happy_model, angry_model, sad_model)
+    timings = timings or StageTimings()
+    counts = {key: count_frame_flags([]) for key in actor_models}
+    # Si se guardan las puntuaciones también se conservan las emociones de rostros por debajo del umbral del actor
+    emotion_floor = min(settings.FACE_SCORE_FLOOR, FRAME_THRESHOLDS['actor']) if score_stores is not None else FRAME_THRESHOLDS['actor']
+
+    # Con registro solo se analizan los frames nuevos o modificados desde la última pasada
+    pending_files = frame_files
+    if ledgers is not None:
+        if video_path is not None:
+            # Los frames de un vídeo cambian todos a la vez cuando cambia el archivo
+            video_stamp = frame_stamp(video_path)
+            stamps = {frame_file: video_stamp for frame_file in frame_files}
+        else:
+            stamps = {frame_file: frame_stamp(os.path.join(frames_dir, frame_file)) for frame_file in frame_files}
+        # Un frame al día en el registro vuelve a analizarse si le faltan sus puntuaciones (almacén nuevo o invalidado)
+        stored = [score_store.stored_frames() for score_store in score_stores.values()] if score_stores is not None else []
+        pending_files = [
+            frame_file for frame_file in frame_files
+            if not all(ledger.is_current(frame_file, stamps[frame_file]) for ledger in ledgers.values())
+            or not all(frame_file in names for names in stored)
+        ]
+    processed_frames = 0
+    previous_flags = {key: 0 for key in actor_models}
+
+    if video_path is not None:
+        frame_batches = video_frame_batches(video_path, pending_files, face_net, face_output_layers, batch_size, face_cache, threshold=0.7, timings=timings, deduplicator=deduplicator)
+    elif face_cache is not None:
+        frame_batches = cached_frame_batches(pending_files, frames_dir, face_net, face_output_layers, batch_size, face_cache, threshold=0.7, timings=timings, deduplicator=deduplicator)
+    else:
+        frame_batches = detect_frame_batches(pending_files, frames_dir, face_net, face_output_layers, batch_size, threshold=0.7, timings=timings, deduplicator=deduplicator)
+
+    for frames in frame_batches:
+        batch_files = pending_files[processed_frames:processed_frames + len(frames)]
+        with timings.measure('classify'):
+            face_frames, actor_scores, emotion_scores = frame_batch_scores(frames, actor_models, emotion_runtime, emotion_floor)
+        duplicates = [position for position, (image, faces) in enumerate(frames) if faces is None]
+        for key in actor_models:
+            flags = frame_flags(len(frames), face_frames, actor_scores[key], *emotion_scores)
+            # Un frame duplicado vale lo mismo que el frame al que sustituye, que siempre es el anterior
+            for position in duplicates:
+                flags[position] = flags[position - 1] if position else previous_flags[key]
+            if len(flags):
+                previous_flags[key] = flags[-1]
+            if score_stores is not None:
+                score_stores[key].record(batch_files, face_frames, actor_scores[key], *emotion_scores)
+                for position in duplicates:
+                    score_stores[key].repeat(batch_files[position], batch_files[position - 1] if position else pending_files[processed_frames - 1])
+                score_stores[key].save_if_due()
+            if ledgers is not None:
+                for frame_file, flag in zip(batch_files, flags):
+                    ledgers[key].record(frame_file, stamps[frame_file], flag)
+                ledgers[key].save_if_due()
+            else:
+                for name, count in count_frame_flags(flags).items():
+                    counts[key][name] += count
+
+        processed_frames += len(frames)
+        timings.frames = processed_frames
+        if progress:
+            progress(processed_frames, len(pending_files))
+
+    if score_stores is not None:
+        for score_store in score_stores.values():
+            score_store.save(frame_files)
+    if ledgers is not None:
+        for ledger in ledgers.values():
+            ledger.save()
+        return {key: ledger.statistics(frame_files) for key, ledger in ledgers.items()}
 
     total_frames = len(frame_files)
-    statistics = {
-        'total_frames': total_frames,
-        'actor_frame_count': actor_frame_count,
-        'happy_frame_count': happy_frame_count,
-        'angry_frame_count': angry_frame_count,
-        'sadness_frame_count': sadness_frame_count
-    }
-    return statistics
+    return {key: {'total_frames': total_frames, **statistics} for key, statistics in counts.items()}
+
+def calculate_frame_statistics(frame_files, frames_dir, actor_model, happy_model, sad_model, angry_model, face_net, face_output_layers, progress=None, batch_size=None, emotion_runtime=None, face_cache=None, ledger=None, score_store=None, timings=None, video_path=None, deduplicator=None):
+    statistics = calculate_movie_statistics(
+        frame_files, frames_dir, {'actor': actor_model}, happy_model, sad_model, angry_model, face_net, face_output_layers,
+        progress=progress, batch_size=batch_size, emotion_runtime=emotion_runtime, face_cache=face_cache,
+        ledgers={'actor': ledger} if ledger is not None else None,
+        score_stores={'actor': score_store} if score_store is not None else None,
+        timings=timings, video_path=video_path, deduplicator=deduplicator
+    )
+    return statistics['actor']
 
 def preprocess_face_for_actor_model(face):
     processed_face = cv2.resize(face, (100, 100))
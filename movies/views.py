@@ -8,6 +8,11 @@ from django.db.models import Avg
 from django.http import JsonResponse
 from django.utils.html import escape
 from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.db import transaction
+from ai_models.moderation import calculate_hate_score, moderation_state, REVIEW_THRESHOLDS, REVIEW_WEIGHTS
+from ai_models.cascade import cascade_hate_score
+from ai_models.jobs import enqueue_moderation
 
 def home(request):
     New = apps.get_model('news', 'New')
@@ -73,23 +78,6 @@ def movie_detail(request, movie_id):
 
     return render(request, 'movie_detail.html', {'movie': movie, 'average_rating': average_rating, 'rating_range': rating_range, 'number_of_reviews': reviews.count, 'last_review': last_review})
 
-def calculate_hate_score(body):
-    my_app_config = apps.get_app_config('ai_models')
-    toxic_model = my_app_config.toxic_model
-    toxic_vectorizer = my_app_config.toxic_vectorizer
-    offensive_model = my_app_config.offensive_model
-    offensive_vectorizer = my_app_config.offensive_vectorizer
-    hate_model = my_app_config.hate_model
-    hate_vectorizer = my_app_config.hate_vectorizer
-
-    hate_score = 0
-
-    for model, vectorizer in [(toxic_model, toxic_vectorizer), (offensive_model, offensive_vectorizer), (hate_model, hate_vectorizer)]:
-        body_vectorized = vectorizer.transform([body])
-        hate_score += model.predict(body_vectorized)[0]
-
-    return hate_score
-
 @login_required
 def create_review(request, movie_id, is_draft=False):
     movie = get_object_or_404(Movie, pk=movie_id)
@@ -111,15 +99,26 @@ def create_review(request, movie_id, is_draft=False):
             review.save()
             messages.info(request, 'Tu reseña ha sido guardada como borrador.')
             return redirect('movie_detail', movie_id=movie.id)
+        elif settings.MODERATION_DEFERRED:
+            review.state = Review.State.IN_REVIEW
+            # Sin su trabajo quedaría en revisión para siempre
+            with transaction.atomic():
+                review.save()
+                enqueue_moderation(review=review)
+            messages.info(request, 'Tu reseña se está revisando y se publicará en breve si cumple las normas de la comunidad.')
         else:
-            hateScore = calculate_hate_score(body)
+            if settings.MODERATION_CASCADE:
+                hateScore = cascade_hate_score((body,), REVIEW_THRESHOLDS, REVIEW_WEIGHTS)
+            else:
+                hateScore = calculate_hate_score(body)
             review.hateScore = hateScore
+            state = moderation_state(hateScore, REVIEW_THRESHOLDS)
 
-            if hateScore < 1:
+            if state == Review.State.PUBLISHED:
                 review.state = Review.State.PUBLISHED
                 review.publicationDate = timezone.now()
                 messages.success(request, '¡Tu reseña ha sido publicada!')
-            elif 1 <= hateScore < 3:
+            elif state == Review.State.IN_REVIEW:
                 review.state = Review.State.IN_REVIEW
                 messages.warning(request, 'Tu reseña está pendiente de aprobación.')
             else:
@@ -155,16 +154,20 @@ def update_review(request, review_id, is_draft=False):
             review.save()
             return redirect('draft_reviews')
         else:
-            hateScore = calculate_hate_score(new_body)
+            if settings.MODERATION_CASCADE:
+                hateScore = cascade_hate_score((new_body,), REVIEW_THRESHOLDS, REVIEW_WEIGHTS)
+            else:
+                hateScore = calculate_hate_score(new_body)
             review.hateScore = hateScore
+            state = moderation_state(hateScore, REVIEW_THRESHOLDS)
 
-            if hateScore < 1:
+            if state == Review.State.PUBLISHED:
                 review.state = Review.State.PUBLISHED
                 review.publicationDate = timezone.now()
                 messages.success(request, 'Reseña publicada exitosamente.')
                 review.save()
                 return redirect('movie_reviews', movie_id=review.movie.id)
-            elif 1 <= hateScore < 3:
+            elif state == Review.State.IN_REVIEW:
                 review.state = Review.State.IN_REVIEW
                 messages.warning(request, 'Tu reseña está pendiente de aprobación.')
                 review.save()
@@ -159,3 +159,41 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
+
+# Modelos de IA
+AI_MODELS_MMAP_MODE = env('AI_MODELS_MMAP_MODE', default='r')
+AI_MODELS_WARM_UP = env.bool('AI_MODELS_WARM_UP', default=False)
+MODERATION_CACHE_SIZE = env.int('MODERATION_CACHE_SIZE', default=10000)
+MODERATION_DEFERRED = env.bool('MODERATION_DEFERRED', default=False)
+MODERATION_SOCKET = env('MODERATION_SOCKET', default='')
+MODERATION_SOCKET_TIMEOUT = env.float('MODERATION_SOCKET_TIMEOUT', default=2.0)
+MODERATION_COMPACT_MODELS = env.bool('MODERATION_COMPACT_MODELS', default=False)
+MODERATION_COMPACT_DIR = env('MODERATION_COMPACT_DIR', default=os.path.join(BASE_DIR, 'ai_models', 'resources', 'compact'))
+MODERATION_CASCADE = env.bool('MODERATION_CASCADE', default=False)
+MODERATION_PREFILTER = env.bool('MODERATION_PREFILTER', default=False)
+MODERATION_PREFILTER_MAX_LENGTH = env.int('MODERATION_PREFILTER_MAX_LENGTH', default=200)
+MODERATION_LEXICON_PATH = env('MODERATION_LEXICON_PATH', default=os.path.join(BASE_DIR, 'ai_models', 'resources', 'moderation_lexicon.txt'))
+
+# Análisis de actuaciones
+PERFORMANCE_ANALYSIS_DEFERRED = env.bool('PERFORMANCE_ANALYSIS_DEFERRED', default=True)
+MODEL_REGISTRY_VERIFY_HASH = env.bool('MODEL_REGISTRY_VERIFY_HASH', default=False)
+ACTOR_MODEL_CACHE_MB = env.int('ACTOR_MODEL_CACHE_MB', default=512)
+FACE_DETECTION_BATCH_SIZE = env.int('FACE_DETECTION_BATCH_SIZE', default=8)
+EMOTION_FUSED_RUNTIME = env.bool('EMOTION_FUSED_RUNTIME', default=True)
+FACE_DETECTION_CACHE = env.bool('FACE_DETECTION_CACHE', default=True)
+FACE_DETECTION_CACHE_DIR = env('FACE_DETECTION_CACHE_DIR', default=os.path.join(BASE_DIR, 'ai_models', 'resources', 'face_cache'))
+PERFORMANCE_ANALYSIS_BY_MOVIE = env.bool('PERFORMANCE_ANALYSIS_BY_MOVIE', default=True)
+FRAME_LEDGER = env.bool('FRAME_LEDGER', default=True)
+FRAME_LEDGER_DIR = env('FRAME_LEDGER_DIR', default=os.path.join(BASE_DIR, 'ai_models', 'resources', 'frame_ledger'))
+FACE_SCORE_STORE = env.bool('FACE_SCORE_STORE', default=True)
+FACE_SCORE_FLOOR = env.float('FACE_SCORE_FLOOR', default=0.5)
+FACE_SCORE_DIR = env('FACE_SCORE_DIR', default=os.path.join(BASE_DIR, 'ai_models', 'resources', 'face_scores'))
+FRAME_DECODE_WORKERS = env.int('FRAME_DECODE_WORKERS', default=4)
+FRAME_PREFETCH_DEPTH = env.int('FRAME_PREFETCH_DEPTH', default=32)
+FRAME_REDUCED_DECODE = env.bool('FRAME_REDUCED_DECODE', default=True)
+FRAME_REDUCED_DECODE_MIN_SIZE = env.int('FRAME_REDUCED_DECODE_MIN_SIZE', default=416)
+VIDEO_INGESTION = env.bool('VIDEO_INGESTION', default=True)
+VIDEO_SAMPLE_RATE = env.float('VIDEO_SAMPLE_RATE', default=0.5)
+MOVIE_VIDEOS_DIR = env('MOVIE_VIDEOS_DIR', default=os.path.join(MEDIA_ROOT, 'videos', 'movies'))
+FRAME_DEDUP = env.bool('FRAME_DEDUP', default=False)
+FRAME_DEDUP_MAX_DISTANCE = env.int('FRAME_DEDUP_MAX_DISTANCE', default=4)
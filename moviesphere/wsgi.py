@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MovieSphere.settings')
 
 application = get_wsgi_application()
+
+# Precarga opcional de los modelos de moderación en cada worker
+from django.apps import apps
+from django.conf import settings
+
+if settings.AI_MODELS_WARM_UP:
+    apps.get_app_config('ai_models').warm_up()
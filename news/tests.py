@@ -4,7 +4,7 @@ from django.contrib.auth.models import User, Group
 from django.apps import apps
 from news.models import New, Category
 from unittest.mock import patch
-from news.views import calculate_hate_score
+from ai_models.moderation import calculate_hate_score
 from news.forms import CategoryForm
 from django.template.loader import render_to_string
 
@@ -135,9 +135,9 @@ class CreateNewTest(TestCase):
         self.draftUrl = reverse('draft_new')
         self.client.login(username='testuser', password='12345')
 
-    @patch('news.views.calculate_hate_score')
-    def test_create_new_published(self, mock_calculate_hate_score):
-        mock_calculate_hate_score.return_value = 0
+    @patch('news.views.score_texts')
+    def test_create_new_published(self, mock_score_texts):
+        mock_score_texts.return_value = [0, 0]
         response = self.client.post(self.publishUrl, {
             'title': 'Good new',
             'body': 'Test Body',
@@ -149,9 +149,9 @@ class CreateNewTest(TestCase):
         self.assertEqual(new.state, New.State.PUBLISHED)
         self.assertEqual(new.hateScore, 0)
 
-    @patch('news.views.calculate_hate_score')
-    def test_create_new_in_review(self, mock_calculate_hate_score):
-        mock_calculate_hate_score.return_value = 1
+    @patch('news.views.score_texts')
+    def test_create_new_in_review(self, mock_score_texts):
+        mock_score_texts.return_value = [1, 1]
         response = self.client.post(self.publishUrl, {
             'title': 'Mild new',
             'body': 'Test Body',
@@ -163,9 +163,9 @@ class CreateNewTest(TestCase):
         self.assertEqual(new.state, New.State.IN_REVIEW)
         self.assertEqual(new.hateScore, 3)
 
-    @patch('news.views.calculate_hate_score')
-    def test_create_new_forbidden(self, mock_calculate_hate_score):
-        mock_calculate_hate_score.return_value = 3
+    @patch('news.views.score_texts')
+    def test_create_new_forbidden(self, mock_score_texts):
+        mock_score_texts.return_value = [3, 3]
         response = self.client.post(self.publishUrl, {
             'title': 'Bad new',
             'body': 'Test Body',
@@ -1,4 +1,3 @@
-from django.apps import apps
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404, render, redirect
 from .models import New, Category
@@ -11,6 +10,11 @@ from django.template.loader import render_to_string
 from .forms import CategoryForm
 from django.utils.html import escape
 from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.db import transaction
+from ai_models.moderation import score_texts, new_hate_score, moderation_state, NEW_THRESHOLDS, NEW_WEIGHTS
+from ai_models.cascade import cascade_hate_score
+from ai_models.jobs import enqueue_moderation
 
 # Create your views here.
 
@@ -50,23 +54,6 @@ def new_detail(request, new_id):
 
     return render(request, 'new_detail.html', {'new': new})
 
-def calculate_hate_score(body):
-    my_app_config = apps.get_app_config('ai_models')
-    toxic_model = my_app_config.toxic_model
-    toxic_vectorizer = my_app_config.toxic_vectorizer
-    offensive_model = my_app_config.offensive_model
-    offensive_vectorizer = my_app_config.offensive_vectorizer
-    hate_model = my_app_config.hate_model
-    hate_vectorizer = my_app_config.hate_vectorizer
-
-    hate_score = 0
-
-    for model, vectorizer in [(toxic_model, toxic_vectorizer), (offensive_model, offensive_vectorizer), (hate_model, hate_vectorizer)]:
-        body_vectorized = vectorizer.transform([body])
-        hate_score += model.predict(body_vectorized)[0]
-
-    return hate_score
-
 @login_required
 def create_new(request, is_draft=False):
     if not request.user.groups.filter(name='Writer').exists():
@@ -94,17 +81,30 @@ def create_new(request, is_draft=False):
             new.save()
             messages.info(request, 'Tu noticia ha sido guardada como borrador.')
             return redirect('draft_news')
+        elif settings.MODERATION_DEFERRED:
+            new.state = New.State.IN_REVIEW
+            # Sin su trabajo quedaría en revisión para siempre
+            with transaction.atomic():
+                new.save()
+                enqueue_moderation(new=new)
+            messages.info(request, 'Tu noticia se está revisando y se publicará en breve si cumple las normas de la comunidad.')
+            return redirect('news')
         else:
-            hateScore = 2*calculate_hate_score(body) + calculate_hate_score(title)
+            if settings.MODERATION_CASCADE:
+                hateScore = cascade_hate_score((body, title), NEW_THRESHOLDS, NEW_WEIGHTS)
+            else:
+                body_score, title_score = score_texts([body, title])
+                hateScore = new_hate_score(body_score, title_score)
             new.hateScore = hateScore
+            state = moderation_state(hateScore, NEW_THRESHOLDS)
 
-            if hateScore < 3:
+            if state == New.State.PUBLISHED:
                 new.state = New.State.PUBLISHED
                 new.publicationDate = timezone.now()
                 new.save()
                 messages.success(request, '¡Tu noticia ha sido publicada!')
                 return redirect('new_detail', new_id=new.id)
-            elif 3 <= hateScore < 7:
+            elif state == New.State.IN_REVIEW:
                 new.state = New.State.IN_REVIEW
                 new.save()
                 messages.warning(request, 'Tu noticia está pendiente de aprobación.')
@@ -145,16 +145,21 @@ def update_new(request, new_id, is_draft=False):
             new.save()
             return redirect('draft_news')
         else:
-            hateScore = 2*calculate_hate_score(new_body) + calculate_hate_score(new_title)
+            if settings.MODERATION_CASCADE:
+                hateScore = cascade_hate_score((new_body, new_title), NEW_THRESHOLDS, NEW_WEIGHTS)
+            else:
+                body_score, title_score = score_texts([new_body, new_title])
+                hateScore = new_hate_score(body_score, title_score)
             new.hateScore = hateScore
+            state = moderation_state(hateScore, NEW_THRESHOLDS)
 
-            if hateScore < 3:
+            if state == New.State.PUBLISHED:
                 new.state = New.State.PUBLISHED
                 new.publicationDate = timezone.now()
                 new.save()
                 messages.success(request, '¡Tu noticia ha sido publicada!')
                 return redirect('new_detail', new_id=new.id)
-            elif 3 <= hateScore < 7:
+            elif state == New.State.IN_REVIEW:
                 new.state = New.State.IN_REVIEW
                 new.save()
                 messages.warning(request, 'Tu noticia está pendiente de aprobación.')